@@ -1,152 +1,186 @@
 import os
-import psycopg2
 import json
-import pytz
-from dotenv import load_dotenv
 import sys
 import logging
+import threading
+from contextlib import contextmanager
 
-# Configure basic logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    stream=sys.stdout,
-)
+from utils.profiling import stage
+from utils.settings import get_settings
 
+# --- Logger Setup ---
+logger = logging.getLogger(__name__)
 
-def load_data(symbol):
+
+# Serialises read-modify-write of the CDC file when symbols are loaded concurrently
+_cdc_lock = threading.Lock()
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+
+def load_data(symbol, sink=None, dry_run=False):
     """
     Load data from API pipeline into PostgreSQL database.
-    """
-    # Add project root to sys.path
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    sys.path.append(project_root)
 
-    import api_pipeline
-    from utils.fetch_last_cdc import fetch_cdc
+    Args:
+        symbol (str): The stock ticker to load.
+        sink: Where to write rows (see ETL/sinks.py). Defaults to PostgreSQL.
+        dry_run (bool): Fetch and parse only; nothing is written and the CDC is not advanced.
 
-    last_cdc = fetch_cdc(symbol=symbol)
+    Returns:
+        (int) number of rows inserted (or that would be written, for a dry run).
 
-    load_dotenv()
-    db_config = {
-        "dbname": os.getenv("DB_NAME"),
-        "user": os.getenv("DB_USER"),
-        "password": os.getenv("DB_PASS"),
-        "host": os.getenv("DB_HOST"),
-        "port": os.getenv("DB_PORT"),
-    }
+    Raises:
+        Whatever the fetch or the sink raised; the CDC is left untouched.
+    """
+    from ETL import api_pipeline
+    from ETL.sinks import get_sink
+    from utils.fetch_last_cdc import fetch_cdc
 
-    # Standard time zone for stocks
-    EASTERN = pytz.timezone("America/New_York")
-    UTC = pytz.utc
+    settings = get_settings()
+
+    last_cdc = fetch_cdc(path=settings.cdc_path, symbol=symbol)
+
+    if not dry_run:
+        sink = sink or get_sink("postgres")
+
+    # Rows arrive in fixed-size batches straight from the streaming parser and
+    # are written one batch at a time, so memory does not grow with the payload.
+    found_rows = 0
+    inserted_rows = 0
+    new_last_cdc = None
+    try:
+        for batch in api_pipeline.fetch_batches(symbol=symbol):
+            found_rows += len(batch)
+            batch_cdc = max(row[0] for row in batch)
+            new_last_cdc = max(new_last_cdc or batch_cdc, batch_cdc)
+            if dry_run:
+                continue
+            with stage("load"):
+                inserted_rows += sink.write(symbol, batch)
+    except Exception as e:
+        # Leave the CDC where it is so the same window is fetched again next run.
+        # Batches written so far are harmless: inserts skip existing rows.
+        # Re-raised so callers (and the CLI exit code) see the failure.
+        logger.error(f"Loading {symbol} failed after {inserted_rows} inserted rows: {e}")
+        raise
+
+    if not found_rows:
+        logger.info(
+            f"FROM: Load_psql.py - No new records found for {symbol}. Exiting!!"
+        )
+        return 0
 
-    data, new_last_cdc = api_pipeline.fetch_data(symbol=symbol)
+    logger.info(f"Found {found_rows} new records after {last_cdc}")
 
-    if not data or (isinstance(data, list) and len(data[0]) == 0):
-        logging.info(
-            f"FROM: Load_psql.py - No new records found for {symbol}. Exiting!!"
+    if dry_run:
+        logger.info(
+            f"Dry run: {found_rows} {symbol} records parsed, nothing written (CDC stays at {last_cdc})."
         )
-        # sys.exit()
-    else:
-        logging.info(f"Found {len(data)} new records after {last_cdc}")
-        try:
-            # First, connect to manage constraints.
-            with psycopg2.connect(**db_config) as conn:
-                conn.autocommit = True
-                try:
-                    with conn.cursor() as cur:
-                        # Drop the old, incorrect constraint if it exists for idempotency
-                        cur.execute(
-                            "ALTER TABLE stocks_data DROP CONSTRAINT IF EXISTS trade_timestamp_utc_unique;"
-                        )
-                        logging.info(
-                            "Dropped old constraint 'trade_timestamp_utc_unique' if it existed."
-                        )
-
-                        # Add the new, correct composite unique constraint
-                        cur.execute(
-                            "ALTER TABLE stocks_data ADD CONSTRAINT symbol_trade_timestamp_utc_unique UNIQUE (symbol, trade_timestamp_utc);"
-                        )
-                        logging.info(
-                            "Successfully added composite UNIQUE constraint on 'symbol' and 'trade_timestamp_utc'."
-                        )
-                except psycopg2.Error:
-                    pass  # Ignore error if constraint already exists
-
-            # Now, connect again for the main ETL process
-            with psycopg2.connect(**db_config) as conn:
-                with conn.cursor() as cur:
-                    create_table = """
-                                        CREATE TABLE IF NOT EXISTS stocks_data(
-                                        trade_timestamp_utc TIMESTAMPTZ NOT NULL,
-                                        symbol VARCHAR(20) NOT NULL,
-                                        open DECIMAL(10, 4) NOT NULL,
-                                        high DECIMAL(10, 4) NOT NULL,
-                                        low DECIMAL(10, 4) NOT NULL,
-                                        close DECIMAL(10, 4) NOT NULL,
-                                        volume BIGINT NOT NULL);
-                                    """
-                    cur.execute(create_table)
-
-                    insert_query = """
-                                    INSERT INTO stocks_data (trade_timestamp_utc, symbol, open, high, low, close, volume)
-                                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                                    ON CONFLICT (symbol, trade_timestamp_utc) DO NOTHING;
-                                    """
-
-                    inserted_rows = 0
-                    for row in data:
-                        cur.execute(insert_query, row)
-                        if cur.rowcount > 0:
-                            inserted_rows += cur.rowcount
-
-                    skipped_rows = len(data) - inserted_rows
-
-                    if inserted_rows > 0:
-                        logging.info(
-                            f"{inserted_rows} {symbol} new rows inserted successfully."
-                        )
-                    if skipped_rows > 0:
-                        logging.info(
-                            f"{skipped_rows} {symbol} records already exist. Skipping."
-                        )
-
-                    # saving
-                    conn.commit()
-                    logging.info("Committed the changes")
-
-        except psycopg2.Error as e:
-            logging.error(e)
-
-        logging.info(f"Updating the last_cdc...... for {symbol}")
+        return found_rows
+
+    skipped_rows = found_rows - inserted_rows
+
+    if inserted_rows > 0:
+        logger.info(f"{inserted_rows} {symbol} new rows inserted successfully.")
+    if skipped_rows > 0:
+        logger.info(f"{skipped_rows} {symbol} records already exist. Skipping.")
+
+    with stage("cdc"):
+        update_cdc(symbol, new_last_cdc, path=settings.cdc_path)
+
+    return inserted_rows
+
 
+@contextmanager
+def _locked_cdc(path):
+    """
+    Holds the CDC file for a read-modify-write: a thread lock, plus an flock
+    on "<path>.lock" so catch-up, incremental and backfill processes take
+    turns as well.
+    """
+    with _cdc_lock:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(f"{path}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+
+def _update_cdc_file(path, update):
+    """
+    Applies update(cdc) to the CDC JSON dict and saves it.
+
+    The file is written to a temp file and swapped in with os.replace, so
+    readers never see half a file. A file that exists but cannot be parsed is
+    left alone (JSONDecodeError is raised): saving an empty dict over it would
+    wipe every symbol's watermark.
+    """
+    with _locked_cdc(path):
         try:
-            # Try reading existing
-            try:
-                with open("cdc_/last_cdc.json", "r") as f:
-                    cdc = json.load(f)
-            except (FileNotFoundError, json.JSONDecodeError):
-                cdc = {}  # If missing or broken, create a fresh dict
+            with open(path, "r") as f:
+                cdc = json.load(f)
+        except FileNotFoundError:
+            cdc = {}
+
+        update(cdc)
 
-            # Ensure key exists (and update value)
-            cdc_key = f"{symbol}_cdc"
-            if cdc_key not in cdc:
-                logging.info(f"{cdc_key} not found. Creating with default value.")
-                cdc[cdc_key] = "1900-01-01 00:00:00"  # default init value
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cdc, f, indent=4)
+        os.replace(tmp_path, path)
+    return cdc
 
-            # Now update with new value
-            cdc[cdc_key] = new_last_cdc
 
-            # Write safely
-            with open("cdc_/last_cdc.json", "w") as f:
-                json.dump(cdc, f, indent=4)
+def update_cdc(symbol, new_last_cdc, path="cdc_/last_cdc.json"):
+    """
+    Stores new_last_cdc as the watermark of symbol in the CDC JSON file.
+    """
+    logger.info(f"Updating the last_cdc...... for {symbol}")
+    cdc_key = f"{symbol}_cdc"
+
+    def update(cdc):
+        if cdc_key not in cdc:
+            logger.info(f"{cdc_key} not found. Creating it.")
+        cdc[cdc_key] = new_last_cdc
+
+    try:
+        cdc = _update_cdc_file(path, update)
+        logger.info(f"last_cdc updated for {cdc_key}: {cdc[cdc_key]}")
+    except json.JSONDecodeError as e:
+        logger.error(f"CDC file {path} is unreadable, not updating {cdc_key}: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected error updating CDC: {e}")
+
+
+def bump_version(symbol, path="cdc_/last_cdc.json"):
+    """
+    Increments the data version of symbol ("<symbol>_version" in the CDC JSON
+    file). Writers that add rows without advancing the watermark (backfill)
+    call this, so the read API's cache still sees that the symbol changed.
+    """
+    version_key = f"{symbol}_version"
 
-            logging.info(f"last_cdc updated for {cdc_key}: {cdc[cdc_key]}")
+    def update(cdc):
+        cdc[version_key] = cdc.get(version_key, 0) + 1
 
-        except Exception as e:
-            logging.error(f"Unexpected error updating CDC: {e}")
+    try:
+        _update_cdc_file(path, update)
+    except json.JSONDecodeError as e:
+        logger.error(f"CDC file {path} is unreadable, not updating {version_key}: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected error updating the data version of {symbol}: {e}")
 
 
 if __name__ == "__main__":
+    # Configure basic logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        stream=sys.stdout,
+    )
     arg1 = sys.argv[1]
     load_data(symbol=arg1)
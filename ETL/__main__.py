@@ -0,0 +1,5 @@
+import sys
+
+from ETL.cli import main
+
+sys.exit(main())
@@ -1,45 +1,68 @@
-import os
 from datetime import datetime, date, timedelta
 import time
-import requests
-from dotenv import load_dotenv
-import sys
 import logging
-from tenacity import retry, wait_fixed, stop_after_attempt
-
-# Add project root to sys.path
-project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-sys.path.append(project_root)
 
+from ETL.stream_parser import ApiError, BATCH_SIZE, CHUNK_SIZE, batched, iter_rows
 from utils.fetch_last_cdc import fetch_cdc
+from utils.profiling import stage
+from utils.settings import get_settings
 
 # --- Logger Setup ---
 # Get a logger instance for this module
 logger = logging.getLogger(__name__)
 
-# --- Configuration ---
-load_dotenv()
-API_KEY = os.getenv("alphavantage_API_KEY")
-
-# Passing only year and month to adhere strictly to API/library documentation for reliability.
-year_month = date.today().strftime("%Y-%m")
-
 # --- Constants ---
 # Defining date time format (used for both parsing CDC and API response)
 FORMAT_CODE = "%Y-%m-%d %H:%M:%S"
 TIME_SERIES_KEY = "Time Series (30min)"
 
 
-@retry(wait=wait_fixed(2), stop=stop_after_attempt(3))
 def fetch_data(symbol):
     """
     Fetches intraday stock data from AlphaVantage since the last CDC timestamp.
-    Returns: (list of tuples) final_data, (datetime object) new_cdc_watermark
+    Retries up to 3 times (tenacity is imported on first call, not at import).
+    Collects fetch_batches() into one list; loaders should iterate fetch_batches()
+    directly so memory does not grow with the payload.
+    Returns: (list of tuples) final_data, (str) new_cdc_watermark
+    """
+    from tenacity import Retrying, wait_fixed, stop_after_attempt
+
+    return Retrying(wait=wait_fixed(2), stop=stop_after_attempt(3))(
+        _fetch_data, symbol
+    )
+
+
+def _fetch_data(symbol):
+    final_data = [row for batch in fetch_batches(symbol) for row in batch]
+    if not final_data:
+        return [], fetch_cdc(path=get_settings().cdc_path, symbol=symbol)
+    return final_data, max(row[0] for row in final_data)
+
+
+def fetch_batches(symbol, batch_size=BATCH_SIZE):
+    """
+    Streams intraday stock data newer than the last CDC timestamp from AlphaVantage.
+
+    The response body is parsed incrementally (see ETL/stream_parser.py), so
+    peak memory is bounded by batch_size regardless of the payload size.
+
+    Args:
+        symbol (str): The stock ticker (e.g., 'IBM').
+        batch_size (int): Maximum number of rows per yielded batch.
+
+    Yields:
+        Lists of up to batch_size row tuples. Nothing is yielded on API errors
+        or when there is no new data.
     """
+    import requests
+
+    settings = get_settings()
+    # Passing only year and month to adhere strictly to API/library documentation for reliability.
+    year_month = date.today().strftime("%Y-%m")
     SYMBOL = symbol
 
     # 1. Fetch and Parse CDC Timestamp
-    last_cdc_str = fetch_cdc(symbol=symbol)
+    last_cdc_str = fetch_cdc(path=settings.cdc_path, symbol=symbol)
 
     # Convert string CDC to datetime object for arithmetic
     try:
@@ -54,64 +77,60 @@ def fetch_data(symbol):
     safe_cdc = last_cdc + timedelta(seconds=1)
 
     # 3. API Call Setup
-    url = f"https://www.alphavantage.co/query?function=TIME_SERIES_INTRADAY&symbol={SYMBOL}&interval=30min&apikey={API_KEY}&month={year_month}"
-    data = None
+    url = f"{settings.api_base_url}?function=TIME_SERIES_INTRADAY&symbol={SYMBOL}&interval=30min&apikey={settings.api_key}&month={year_month}"
+    r = None
     for i in range(3):  # Try 3 times
         try:
-            r = requests.get(url)
-            r.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
-            data = r.json()
+            with stage("fetch"):
+                # stream=True: the body is read chunk by chunk while parsing
+                r = requests.get(url, stream=True)
+                try:
+                    r.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+                except requests.exceptions.HTTPError:
+                    # The streamed body was never read, so release its pooled connection
+                    r.close()
+                    raise
             break  # If successful, break the loop
         except requests.exceptions.RequestException as e:
+            r = None
             logger.warning(f"API call failed (attempt {i + 1}/3): {e}")
             time.sleep(5)  # Wait 5 seconds before trying again
 
-    if data is None:
+    if r is None:
         logger.error("API call failed after 3 attempts. Exiting.")
-        return [], last_cdc
-
-    # 4. Error and Rate Limit Check
-    if TIME_SERIES_KEY not in data:
-        error_message = data.get(
-            "Note", "Check API key or symbol, or check API rate limits. Exiting!!"
-        )
-        logger.error(
-            f"Error fetching data for {SYMBOL}: {data['Information'] if 'Information' in data else error_message}"
-        )
-        # Return empty list and current CDC without halting the program
-        return [], last_cdc
-
-    all_dates = list(data[TIME_SERIES_KEY].keys())
-
-    # 5. Filter Data
-    new_timestamps = [
-        dt for dt in all_dates if datetime.strptime(dt, FORMAT_CODE) >= safe_cdc
-    ]
-
-    if not new_timestamps:
+        return
+
+    # 4. Filter and Build Dataset while streaming (Converting values to float)
+    rows = iter_rows(
+        r.iter_content(chunk_size=CHUNK_SIZE), TIME_SERIES_KEY, SYMBOL, since=safe_cdc
+    )
+    batches = batched(rows, batch_size)
+    total = 0
+    try:
+        while True:
+            # Reading the rest of the body happens here too, so it counts as parse time
+            with stage("parse"):
+                batch = next(batches, None)
+            if batch is None:
+                break
+            total += len(batch)
+            yield batch
+    except ApiError as e:
+        # 5. Error and Rate Limit Check
+        logger.error(f"Error fetching data for {SYMBOL}: {e}")
+        return
+    finally:
+        r.close()
+
+    if not total:
         logger.info(
             f"FROM: api_pipeline.py - No new data found for {symbol} since last CDC {last_cdc_str}. Exiting!!"
         )
-        return [[]], last_cdc
-
-    # Get raw keys for one entry
-    raw_keys = list(data[TIME_SERIES_KEY][new_timestamps[0]].keys())
-
-    # 6. Build Final Dataset (Converting values to float)
-    final_data = [
-        tuple(
-            [ts]  # Timestamp (str)
-            + [SYMBOL]  # Symbol (str)
-            + [
-                float(data[TIME_SERIES_KEY][ts][key]) for key in raw_keys
-            ]  # Values (float)
-        )
-        for ts in new_timestamps
-    ]
+        return
 
-    logger.info(f"Successfully fetched {len(final_data)} new data records for {symbol}")
-    return final_data, all_dates[0]
+    logger.info(f"Successfully fetched {total} new data records for {symbol}")
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     print(fetch_data(symbol="V"))
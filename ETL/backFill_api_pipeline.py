@@ -1,36 +1,13 @@
-import os
 from datetime import datetime
 import time
-import requests
-from dotenv import load_dotenv
-import sys
 import logging
-from tenacity import retry, wait_fixed, stop_after_attempt
 
-# Add project root to sys.path
-project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-sys.path.append(project_root)
+from ETL.stream_parser import ApiError, BATCH_SIZE, CHUNK_SIZE, batched, iter_rows
+from utils.profiling import stage
+from utils.settings import get_settings
 
 # --- Logger Setup ---
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-# Configure basic logging if not already done
-if not logger.handlers:
-    ch = logging.StreamHandler()
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    ch.setFormatter(formatter)
-    logger.addHandler(ch)
-
-# --- Configuration ---
-load_dotenv()
-API_KEY = os.getenv("alphavantage_API_KEY")
-if not API_KEY:
-    logger.error(
-        "API key for AlphaVantage not found. Set alphavantage_API_KEY in .env file."
-    )
-    sys.exit(1)
 
 # --- Constants ---
 FORMAT_CODE = "%Y-%m-%d %H:%M:%S"
@@ -48,7 +25,6 @@ year_months = [
 ]
 
 
-@retry(wait=wait_fixed(2), stop=stop_after_attempt(3))
 def fetch_data(symbol: str, target_year_month: str):
     """
     Fetches intraday stock data from AlphaVantage for a specific year and month.
@@ -61,80 +37,128 @@ def fetch_data(symbol: str, target_year_month: str):
         A list of tuples, where each tuple represents a row of stock data.
         Returns an empty list if there's an error or no data.
     """
-    url = f"https://www.alphavantage.co/query?function=TIME_SERIES_INTRADAY&symbol={symbol}&interval=30min&apikey={API_KEY}&month={target_year_month}"
-    logger.info(f"Attempting to fetch {symbol} for month {target_year_month}...")
+    return [row for batch in fetch_batches(symbol, target_year_month) for row in batch]
 
-    # --- API Request Block ---
-    try:
-        r = requests.get(url)
-        r.raise_for_status()  # Raises an exception for bad status codes (4xx or 5xx)
-        data = r.json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"API call failed for {target_year_month} after retries: {e}")
-        raise  # Re-raise to let tenacity handle the retry
 
-    # --- Error and Rate Limit Check ---
-    if TIME_SERIES_KEY not in data:
-        error_message = data.get("Note", data.get("Information", "Unknown API error."))
-        logger.error(
-            f"Error fetching data for {symbol} ({target_year_month}): {error_message}"
-        )
-        return []  # Return empty list to signify failure
+def fetch_batches(
+    symbol: str,
+    target_year_month: str,
+    batch_size: int = BATCH_SIZE,
+    raise_api_errors: bool = False,
+):
+    """
+    Streams one month of intraday stock data from AlphaVantage in fixed-size batches.
 
-    all_timestamps = list(data[TIME_SERIES_KEY].keys())
+    The response body is parsed incrementally (see ETL/stream_parser.py), so
+    memory stays bounded by batch_size however large the month is.
 
-    if not all_timestamps:
-        logger.info(
-            f"No data returned for {symbol} for month {target_year_month}. Skipping."
-        )
-        return []
+    Args:
+        symbol (str): The stock ticker (e.g., 'V').
+        target_year_month (str): The month to fetch (e.g., '2024-05').
+        batch_size (int): Maximum number of rows per yielded batch.
+        raise_api_errors (bool): Raise ApiError (e.g. rate limit "Note") instead of
+            logging it, for callers that must tell a failure from an empty month.
 
-    # Get raw keys from the first data point
-    raw_keys = list(data[TIME_SERIES_KEY][all_timestamps[0]].keys())
+    Yields:
+        Lists of up to batch_size row tuples. Nothing is yielded on API errors.
+    """
+    from tenacity import Retrying, wait_fixed, stop_after_attempt
+
+    settings = get_settings()
+    url = f"{settings.api_base_url}?function=TIME_SERIES_INTRADAY&symbol={symbol}&interval=30min&apikey={settings.api_key}&month={target_year_month}"
+    logger.info(f"Attempting to fetch {symbol} for month {target_year_month}...")
 
-    # --- Build Final Dataset ---
-    final_data = [
-        tuple(
-            [ts]
-            + [symbol]
-            + [float(data[TIME_SERIES_KEY][ts][key]) for key in raw_keys]
+    # --- API Request Block ---
+    # Only opening the connection is retried; a stream that breaks half way
+    # raises to the caller, which skips the month.
+    r = Retrying(wait=wait_fixed(2), stop=stop_after_attempt(3), reraise=True)(
+        _open_stream, url, target_year_month
+    )
+
+    # --- Build Final Dataset while streaming ---
+    batches = batched(
+        iter_rows(r.iter_content(chunk_size=CHUNK_SIZE), TIME_SERIES_KEY, symbol),
+        batch_size,
+    )
+    total = 0
+    try:
+        while True:
+            with stage("parse"):
+                batch = next(batches, None)
+            if batch is None:
+                break
+            total += len(batch)
+            yield batch
+    except ApiError as e:
+        # --- Error and Rate Limit Check ---
+        logger.error(f"Error fetching data for {symbol} ({target_year_month}): {e}")
+        if raise_api_errors:
+            raise
+        return
+    finally:
+        r.close()
+
+    if not total:
+        logger.info(
+            f"No data returned for {symbol} for month {target_year_month}. Skipping."
         )
-        for ts in all_timestamps
-    ]
+        return
 
     logger.info(
-        f"Successfully fetched {len(final_data)} records for {symbol} in {target_year_month}."
+        f"Successfully fetched {total} records for {symbol} in {target_year_month}."
     )
-    return final_data
 
 
-def backfill_data(symbol: str):
+def _open_stream(url: str, target_year_month: str):
+    import requests
+
+    try:
+        with stage("fetch"):
+            r = requests.get(url, stream=True)
+            try:
+                r.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+            except requests.exceptions.HTTPError:
+                # The streamed body was never read, so release its pooled connection
+                # (tenacity keeps the last exception, which still references the response)
+                r.close()
+                raise
+    except requests.exceptions.RequestException as e:
+        logger.error(f"API call failed for {target_year_month}: {e}")
+        raise  # Re-raise to let tenacity handle the retry
+    return r
+
+
+def backfill_data(symbol: str, months=None):
     """
     Primary generator function to iterate through all months and yield data chunks.
     This approach is memory-efficient as it doesn't load the entire dataset into memory.
 
     Args:
         symbol (str): The stock symbol to backfill (e.g., 'V').
+        months (list): Year-month strings to fetch. Defaults to 2000-01 up to the current year.
 
     Yields:
-        A list of tuples (a chunk of data for one month).
+        A list of tuples (a batch of at most BATCH_SIZE rows; a month may span several batches).
     """
+    if not get_settings().api_key:
+        logger.error(
+            "API key for AlphaVantage not found. Set alphavantage_API_KEY in .env file."
+        )
+        raise ValueError("Missing required .env variable: alphavantage_API_KEY")
+
     logger.info(f"Starting backfill for symbol: {symbol}...")
 
     # --- Loop through all required months ---
-    for target_month in year_months:
-        data_chunk = []
+    for target_month in months or year_months:
         try:
-            data_chunk = fetch_data(symbol=symbol, target_year_month=target_month)
+            yield from fetch_batches(symbol=symbol, target_year_month=target_month)
         except Exception as e:
-            # This catches the final exception after tenacity retries have failed
+            # This catches the final exception after tenacity retries have failed,
+            # or a stream that broke part way through the month
             logger.error(
                 f"Failed to fetch data for {symbol} in month {target_month}. Moving to next month. Error: {e}"
             )
 
-        if data_chunk:
-            yield data_chunk
-
         # --- Rate Limit Protection ---
         # Wait after every attempt, successful or not, to respect the API limit.
         logger.debug(
@@ -146,6 +170,11 @@ def backfill_data(symbol: str):
 
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
     # --- Example Usage ---
     # This demonstrates how to use the `backfill_data` generator.
     # Instead of printing, you would typically insert each `monthly_data_chunk`
@@ -0,0 +1,235 @@
+import os
+import json
+import logging
+
+# --- Logger Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+OUTBOX_TABLE = "stocks_data_outbox"
+CONSUMERS_TABLE = "stocks_data_outbox_consumers"
+NOTIFY_CHANNEL = "stocks_data_changes"
+COLUMNS = (
+    "trade_timestamp_utc",
+    "symbol",
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+)
+
+
+def ensure_outbox(cur):
+    """
+    Creates the append-only outbox table if it does not exist yet.
+
+    Every row newly inserted into stocks_data gets one outbox row. The
+    BIGSERIAL change_id is the offset consumers track to tail the feed; they
+    record it in the consumers table so prune_changes() knows what was read.
+    """
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {OUTBOX_TABLE}(
+            change_id BIGSERIAL PRIMARY KEY,
+            trade_timestamp_utc TIMESTAMPTZ NOT NULL,
+            symbol VARCHAR(20) NOT NULL,
+            open DECIMAL(10, 4) NOT NULL,
+            high DECIMAL(10, 4) NOT NULL,
+            low DECIMAL(10, 4) NOT NULL,
+            close DECIMAL(10, 4) NOT NULL,
+            volume BIGINT NOT NULL,
+            published_at TIMESTAMPTZ NOT NULL DEFAULT now());
+        """
+    )
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {CONSUMERS_TABLE}(
+            consumer VARCHAR(100) PRIMARY KEY,
+            change_id BIGINT NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now());
+        """
+    )
+
+
+def publish_changes(cur, symbol, rows, sinks=()):
+    """
+    Publishes rows that were newly inserted into stocks_data.
+
+    The outbox insert runs on the caller's cursor so it commits (or rolls back)
+    together with the stocks_data insert. The "file" stream is not written
+    here: the caller appends to it with append_to_log() once the transaction
+    has committed, so the log never holds changes that were rolled back.
+
+    Args:
+        cur: An open psycopg2 cursor inside the loading transaction.
+        symbol (str): The stock ticker the rows belong to.
+        rows (list): Tuples as returned by the RETURNING clause, in COLUMNS order.
+        sinks (iterable): Optional extra streams; "notify" is sent on commit.
+
+    Returns:
+        (list of int) the change_id of every row, in rows order ([] if nothing was published).
+    """
+    if not rows:
+        return []
+
+    from psycopg2.extras import execute_values
+
+    # Ids come from RETURNING: with concurrent writers they are not contiguous
+    change_ids = [
+        change_id
+        for (change_id,) in execute_values(
+            cur,
+            f"""
+            INSERT INTO {OUTBOX_TABLE} ({", ".join(COLUMNS)})
+            VALUES %s
+            RETURNING change_id;
+            """,
+            rows,
+            fetch=True,
+        )
+    ]
+    first_id, last_id = min(change_ids), max(change_ids)
+    logger.info(
+        f"Published {len(rows)} {symbol} changes to {OUTBOX_TABLE} (ids {first_id}-{last_id})."
+    )
+
+    if "notify" in sinks:
+        # NOTIFY payloads are capped at 8000 bytes, so only send a pointer into
+        # the outbox. Notifications are delivered on commit. Other writers may
+        # hold ids inside the range, so consumers should read the outbox with
+        # read_changes() rather than fetch the range directly.
+        payload = json.dumps(
+            {
+                "symbol": symbol,
+                "first_change_id": first_id,
+                "last_change_id": last_id,
+                "count": len(rows),
+            }
+        )
+        cur.execute("SELECT pg_notify(%s, %s);", (NOTIFY_CHANNEL, payload))
+
+    return change_ids
+
+
+def append_to_log(path, rows, change_ids=None):
+    """
+    Appends rows to a file-backed change log, one JSON object per line.
+    Call it only after the transaction that inserted the rows has committed.
+
+    Consumers keep their own byte offset into the file (see read_log).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for i, row in enumerate(rows):
+            record = {col: _to_json(value) for col, value in zip(COLUMNS, row)}
+            if change_ids is not None:
+                record["change_id"] = change_ids[i]
+            f.write(json.dumps(record) + "\n")
+
+
+def read_log(path, offset=0, limit=None):
+    """
+    Reads change records from the file-backed log starting at a byte offset.
+
+    Args:
+        path (str): Path of the change log.
+        offset (int): Byte offset returned by the previous call (0 to start).
+        limit (int): Maximum number of records to return, or None for all.
+
+    Returns:
+        (list of dict) records, (int) offset to pass on the next call.
+    """
+    records = []
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while limit is None or len(records) < limit:
+                line = f.readline()
+                # A line without its newline is still being written; leave it for next time
+                if not line or not line.endswith(b"\n"):
+                    break
+                records.append(json.loads(line))
+                offset = f.tell()
+    except FileNotFoundError:
+        pass
+    return records, offset
+
+
+def read_changes(cur, after_change_id=0, limit=1000):
+    """
+    Reads outbox rows with a change_id greater than the consumer's offset.
+
+    change_id is taken when a row is inserted, not when it commits, so with
+    concurrent writers a lower id can become visible after a higher one was
+    already read; a consumer that moved its offset past it would skip it for
+    good. Rows are therefore only returned once every transaction that was
+    running before them has finished: their inserting transaction (xmin) must
+    be older than the oldest transaction still in flight (the snapshot xmin).
+    Newer rows are returned by a later call.
+
+    Returns:
+        A list of tuples (change_id, *COLUMNS) in change_id order.
+    """
+    # Row xmin is a 32-bit xid while the snapshot horizon is 64-bit; age()
+    # compares both relative to the current xid, so wraparound is handled.
+    cur.execute(
+        f"""
+        WITH horizon AS (
+            SELECT (pg_snapshot_xmin(pg_current_snapshot())::text::bigint % 4294967296)::text::xid AS oldest_xid
+        )
+        SELECT change_id, {", ".join(COLUMNS)}
+        FROM {OUTBOX_TABLE}, horizon
+        WHERE change_id > %s AND age({OUTBOX_TABLE}.xmin) > age(horizon.oldest_xid)
+        ORDER BY change_id
+        LIMIT %s;
+        """,
+        (after_change_id, limit),
+    )
+    return cur.fetchall()
+
+
+def commit_offset(cur, consumer, change_id):
+    """
+    Records that consumer has processed every change up to change_id. Offsets
+    only move forward, so a late or repeated commit is harmless.
+    """
+    cur.execute(
+        f"""
+        INSERT INTO {CONSUMERS_TABLE} (consumer, change_id) VALUES (%s, %s)
+        ON CONFLICT (consumer) DO UPDATE SET
+            change_id = GREATEST({CONSUMERS_TABLE}.change_id, EXCLUDED.change_id),
+            updated_at = now();
+        """,
+        (consumer, change_id),
+    )
+
+
+def prune_changes(cur):
+    """
+    Deletes outbox rows that every registered consumer has already read (up to
+    the lowest committed offset). Nothing is deleted while no consumer has
+    committed an offset, so a consumer must call commit_offset() before its
+    rows can be trimmed.
+
+    Returns:
+        (int) rows deleted.
+    """
+    cur.execute(
+        f"""
+        DELETE FROM {OUTBOX_TABLE}
+        WHERE change_id <= (SELECT min(change_id) FROM {CONSUMERS_TABLE});
+        """
+    )
+    deleted = cur.rowcount
+    logger.info(f"Pruned {deleted} change(s) from {OUTBOX_TABLE}.")
+    return deleted
+
+
+def _to_json(value):
+    """Makes datetimes and Decimals JSON serialisable."""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if value is None or isinstance(value, (int, str)):
+        return value
+    return float(value)
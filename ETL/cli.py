@@ -0,0 +1,418 @@
+import os
+import sys
+import time
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.profiling import profiled, worker_profile
+
+# --- Logger Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SYMBOLS_FILE = os.path.join(project_root, "Config", "symbols.txt")
+
+
+def read_symbols(path):
+    """
+    Reads one symbol per line; blank lines and '#' comments are ignored.
+    """
+    symbols = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            symbol = line.split("#", 1)[0].strip()
+            if symbol and symbol not in symbols:
+                symbols.append(symbol)
+    return symbols
+
+
+def resolve_symbols(args):
+    """Symbols given on the command line win; otherwise read --symbols-file."""
+    if args.symbols:
+        return args.symbols
+    return read_symbols(args.symbols_file or DEFAULT_SYMBOLS_FILE)
+
+
+def run_per_symbol(symbols, fn, concurrency=1):
+    """
+    Calls fn(symbol) for every symbol using up to `concurrency` threads.
+
+    Returns:
+        (dict) symbol -> result, (list) symbols that raised.
+    """
+    results, failed = {}, []
+
+    def run_one(symbol):
+        try:
+            results[symbol] = fn(symbol)
+        except Exception:
+            logger.exception(f"{symbol} failed.")
+            failed.append(symbol)
+
+    if concurrency <= 1:
+        for symbol in symbols:
+            run_one(symbol)
+    else:
+        def run_in_worker(symbol):
+            # The main thread only waits on the pool; profile where the work happens
+            with worker_profile():
+                run_one(symbol)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(run_in_worker, symbols))
+
+    return results, failed
+
+
+# --- Subcommands ---
+def cmd_incremental(args):
+    from ETL.Load_psql import load_data
+    from ETL.sinks import get_sink
+
+    sink = None if args.dry_run else get_sink(args.sink)
+    results, failed = run_per_symbol(
+        resolve_symbols(args),
+        lambda symbol: load_data(symbol, sink=sink, dry_run=args.dry_run),
+        concurrency=args.concurrency,
+    )
+    verb = "parsed" if args.dry_run else "inserted"
+    logger.info(f"Incremental run finished: {sum(results.values())} rows {verb}.")
+    return 1 if failed else 0
+
+
+def cmd_backfill(args):
+    from ETL.backFill_api_pipeline import backfill_data, year_months
+    from ETL.Load_psql import bump_version
+    from ETL.sinks import get_sink
+    from utils.profiling import stage
+    from utils.settings import get_settings
+
+    months = [
+        m
+        for m in year_months
+        if (not args.start_month or m >= args.start_month)
+        and (not args.end_month or m <= args.end_month)
+    ]
+    sink = None if args.dry_run else get_sink(args.sink)
+
+    def backfill_symbol(symbol):
+        total = 0
+        for chunk in backfill_data(symbol=symbol, months=months):
+            if args.dry_run:
+                total += len(chunk)
+                continue
+            with stage("load"):
+                inserted = sink.write(symbol, chunk)
+            total += inserted
+            if inserted:
+                # Backfill leaves the watermark alone; tell read caches the symbol changed
+                bump_version(symbol, path=get_settings().cdc_path)
+        logger.info(
+            f"Backfill of {symbol} finished: {total} rows {'parsed' if args.dry_run else 'inserted'}."
+        )
+        return total
+
+    _, failed = run_per_symbol(
+        resolve_symbols(args), backfill_symbol, concurrency=args.concurrency
+    )
+    return 1 if failed else 0
+
+
+def cmd_gap_scan(args):
+    from ETL.gap_scan import find_gaps
+    from ETL.sinks import get_sink
+
+    sink = get_sink(args.sink)
+
+    def scan(symbol):
+        gaps = 0
+        missing = 0
+        for previous, following, count in find_gaps(sink.timestamps(symbol)):
+            gaps += 1
+            missing += count
+            if gaps <= args.show:
+                logger.info(f"{symbol}: {count} bar(s) missing between {previous} and {following}")
+        logger.info(f"{symbol}: {gaps} gap(s), {missing} missing bar(s).")
+        return gaps
+
+    _, failed = run_per_symbol(
+        resolve_symbols(args), scan, concurrency=args.concurrency
+    )
+    return 1 if failed else 0
+
+
+def cmd_catch_up(args):
+    from ETL import scheduler
+    from ETL.sinks import get_sink
+    from utils.settings import get_settings
+
+    symbols = resolve_symbols(args)
+    state = scheduler.SchedulerState()
+    positions = scheduler.catch_up_positions(
+        symbols, scheduler.load_watermarks(symbols, get_settings().cdc_path), state, args.start_month
+    )
+
+    exit_code = 0
+    if args.plan_only:
+        for symbol, month in scheduler.plan(
+            symbols, positions, state, args.quota, start_month=args.start_month
+        ):
+            logger.info(f"Planned: {symbol} {month}")
+    else:
+        succeeded, failed = scheduler.run(
+            symbols,
+            args.quota,
+            sink=None if args.dry_run else get_sink(args.sink),
+            dry_run=args.dry_run,
+            delay=args.delay,
+            start_month=args.start_month,
+        )
+        logger.info(f"Catch-up finished: {succeeded} call(s) succeeded, {failed} failed.")
+        exit_code = 1 if failed else 0
+        state = scheduler.SchedulerState()
+        positions = scheduler.catch_up_positions(
+            symbols, scheduler.load_watermarks(symbols, get_settings().cdc_path), state, args.start_month
+        )
+
+    projection = scheduler.project(
+        symbols,
+        positions,
+        state,
+        args.calls_per_day or args.quota,
+        start_month=args.start_month,
+    )
+    eta = projection["eta"].strftime("%Y-%m-%d") if projection["eta"] else "never"
+    logger.info(
+        f"Freshness projection: {projection['remaining_calls']} month(s) to fetch "
+        f"(~{projection['expected_calls']} calls with retries), {projection['days']} day(s) "
+        f"at {args.calls_per_day or args.quota} calls/day, fully fresh by {eta}. "
+        f"Mean staleness now {projection['mean_staleness_days']:.1f} days."
+    )
+    return exit_code
+
+
+def cmd_benchmark(args):
+    from utils.bench_imports import run, format_report
+
+    print(format_report(run(args.modules or None, repeat=args.repeat)))
+    return 0
+
+
+def cmd_serve(args):
+    from ETL.read_api import StocksReader, make_server
+
+    reader = StocksReader(sink=args.sink, cache_size=args.cache_size)
+    server = make_server(reader, host=args.host, port=args.port)
+    logger.info(f"Serving stocks_data on http://{args.host}:{server.server_port}/bars (Ctrl+C to stop).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        reader.close()
+    return 0
+
+
+def cmd_retention(args):
+    from ETL import retention
+
+    moved = retention.run(
+        older_than_days=args.older_than_days, parquet_dir=args.parquet, vacuum=args.vacuum
+    )
+    logger.info(f"Moved {moved} row(s) to the cold tier.")
+    return 0
+
+
+def cmd_prune_outbox(args):
+    import psycopg2
+    from ETL.cdc_outbox import ensure_outbox, prune_changes
+    from utils.settings import get_settings
+
+    conn = psycopg2.connect(**get_settings().db_config)
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                ensure_outbox(cur)
+                prune_changes(cur)
+    finally:
+        conn.close()
+    return 0
+
+
+def cmd_load_test(args):
+    from utils.load_test import run, format_report
+
+    report = run(
+        resolve_symbols(args),
+        years=args.years,
+        sink=args.sink,
+        concurrency=args.concurrency,
+        latency=args.latency,
+        note_rate=args.note_rate,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        workdir=args.workdir,
+    )
+    print(format_report(report))
+    return 0 if report["ok"] else 1
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--profile",
+        metavar="DIR",
+        help="Write cProfile stats (.pstats) and a per-stage wall-time summary to DIR.",
+    )
+
+    symbols = argparse.ArgumentParser(add_help=False)
+    symbols.add_argument("symbols", nargs="*", help="Symbols to process.")
+    symbols.add_argument(
+        "--symbols-file",
+        help=f"File with one symbol per line (default: {os.path.relpath(DEFAULT_SYMBOLS_FILE, project_root)}).",
+    )
+    symbols.add_argument(
+        "--sink",
+        choices=["postgres", "sqlite"],
+        default="postgres",
+        help="Where rows are written / read from.",
+    )
+
+    parallel = argparse.ArgumentParser(add_help=False)
+    parallel.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of symbols processed in parallel. Each worker makes its own API calls, so mind the rate limit.",
+    )
+
+    parser = argparse.ArgumentParser(
+        prog="python -m ETL", description="Stocks ETL pipeline."
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser(
+        "incremental", parents=[common, symbols, parallel], help="Fetch bars newer than each symbol's CDC."
+    )
+    p.add_argument("--dry-run", action="store_true", help="Fetch and parse but write nothing.")
+    p.set_defaults(func=cmd_incremental)
+
+    p = sub.add_parser(
+        "backfill", parents=[common, symbols, parallel], help="Fetch history month by month."
+    )
+    p.add_argument("--dry-run", action="store_true", help="Fetch and parse but write nothing.")
+    p.add_argument("--start-month", help="First month to fetch, e.g. 2020-01.")
+    p.add_argument("--end-month", help="Last month to fetch, e.g. 2024-12.")
+    p.set_defaults(func=cmd_backfill)
+
+    p = sub.add_parser(
+        "gap-scan", parents=[common, symbols, parallel], help="Report missing intraday bars in the stored data."
+    )
+    p.add_argument("--show", type=int, default=10, help="Gaps to print per symbol.")
+    p.set_defaults(func=cmd_gap_scan)
+
+    p = sub.add_parser(
+        "catch-up",
+        parents=[common, symbols],
+        help="Spend an API call quota on the most-behind symbols first.",
+    )
+    p.add_argument("--quota", type=int, default=25, help="API calls to spend in this run.")
+    p.add_argument(
+        "--calls-per-day",
+        type=int,
+        help="Daily call budget used for the freshness projection (default: --quota).",
+    )
+    p.add_argument(
+        "--start-month",
+        default="2000-01",
+        help="Where history starts for symbols without a CDC watermark.",
+    )
+    p.add_argument(
+        "--delay",
+        type=float,
+        help="Seconds between API calls (default: the backfill rate-limit delay).",
+    )
+    p.add_argument("--plan-only", action="store_true", help="Print the plan and projection; make no calls.")
+    p.add_argument("--dry-run", action="store_true", help="Fetch and parse but write nothing.")
+    p.set_defaults(func=cmd_catch_up)
+
+    p = sub.add_parser("benchmark", parents=[common], help="Measure cold import time of the entry modules.")
+    p.add_argument("modules", nargs="*", help="Modules to measure (default: entry modules).")
+    p.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module.")
+    p.set_defaults(func=cmd_benchmark)
+
+    p = sub.add_parser("serve", parents=[common], help="Serve cached read queries over HTTP.")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    p.add_argument("--sink", choices=["postgres", "sqlite"], default="postgres")
+    p.add_argument("--cache-size", type=int, default=512, help="Max cached query results.")
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser(
+        "retention",
+        parents=[common],
+        help="Move old stocks_data history into the compact cold tier (Postgres).",
+    )
+    p.add_argument(
+        "--older-than-days",
+        type=int,
+        default=365,
+        help="Move whole months older than this many days.",
+    )
+    p.add_argument("--parquet", metavar="DIR", help="Also export each moved month to Parquet (needs pyarrow).")
+    p.add_argument("--vacuum", action="store_true", help="VACUUM (ANALYZE) stocks_data afterwards.")
+    p.set_defaults(func=cmd_retention)
+
+    p = sub.add_parser(
+        "prune-outbox",
+        parents=[common],
+        help="Delete outbox changes every registered consumer has read (Postgres).",
+    )
+    p.set_defaults(func=cmd_prune_outbox)
+
+    p = sub.add_parser(
+        "load-test",
+        parents=[common, parallel],
+        help="Run the full ingestion against a local fake AlphaVantage and check the result.",
+    )
+    # Own copies of the symbol options: the shared --sink defaults to postgres
+    p.add_argument("symbols", nargs="*", help="Symbols to process.")
+    p.add_argument("--symbols-file", help="File with one symbol per line.")
+    p.add_argument(
+        "--sink",
+        choices=["postgres", "sqlite"],
+        default="sqlite",
+        help="sqlite (temp file) or postgres (DB_* must point at an empty throwaway database).",
+    )
+    p.add_argument("--years", type=int, default=3, help="Years of history to ingest.")
+    p.add_argument("--latency", type=float, default=0.0, help="Seconds the fake API waits before every answer.")
+    p.add_argument("--note-rate", type=float, default=0.05, help="Share of months answered once with a rate-limit Note.")
+    p.add_argument("--error-rate", type=float, default=0.0, help="Share of months answered once with HTTP 500.")
+    p.add_argument("--seed", type=int, default=0, help="Picks which months fail.")
+    p.add_argument("--workdir", help="Keep the SQLite file, CDC and scheduler state here (default: a temp dir).")
+    p.set_defaults(func=cmd_load_test)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        stream=sys.stdout,
+    )
+
+    start = time.perf_counter()
+    if args.profile:
+        # Pool workers (run_per_symbol) are profiled too and merged into the same .pstats
+        with profiled(args.profile, args.command):
+            exit_code = args.func(args)
+    else:
+        exit_code = args.func(args)
+    logger.info(f"'{args.command}' finished in {time.perf_counter() - start:.2f}s.")
+    return exit_code
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+# --- Constants ---
+INTERVAL = timedelta(minutes=30)
+
+
+def find_gaps(timestamps, interval: timedelta = INTERVAL):
+    """
+    Finds missing bars between consecutive stored timestamps of one symbol.
+
+    Only gaps inside the same calendar day are reported, so overnight closes,
+    weekends and holidays are not flagged.
+
+    Args:
+        timestamps (iterable): datetimes in ascending order (may be a generator).
+        interval (timedelta): Expected spacing between bars.
+
+    Yields:
+        (previous_timestamp, next_timestamp, missing_bar_count) for every gap.
+    """
+    previous = None
+    for ts in timestamps:
+        if previous is not None and ts.date() == previous.date():
+            delta = ts - previous
+            if delta > interval:
+                yield previous, ts, int(delta / interval) - 1
+        previous = ts
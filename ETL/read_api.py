@@ -0,0 +1,388 @@
+import os
+import sys
+import json
+import queue
+import threading
+import time
+import logging
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from utils.settings import get_settings
+
+# --- Logger Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+INTERVALS = ("30min",)
+COLUMNS = ("trade_timestamp_utc", "open", "high", "low", "close", "volume")
+DEFAULT_CACHE_SIZE = 512
+RACY_MTIME_NS = 2_000_000_000
+
+# Prepared once per connection; $1 = symbol. stocks_data_all also covers the
+# history moved to the cold tier (see ETL/retention.py).
+PG_PREPARE = {
+    "last_bars": f"""
+        PREPARE last_bars(text, int) AS
+        SELECT {", ".join(COLUMNS)} FROM stocks_data_all
+        WHERE symbol = $1 ORDER BY trade_timestamp_utc DESC LIMIT $2;
+    """,
+    "day_range": f"""
+        PREPARE day_range(text, timestamptz, timestamptz) AS
+        SELECT {", ".join(COLUMNS)} FROM stocks_data_all
+        WHERE symbol = $1 AND trade_timestamp_utc >= $2 AND trade_timestamp_utc < $3
+        ORDER BY trade_timestamp_utc;
+    """,
+}
+
+# sqlite3 keeps compiled statements in a per-connection cache keyed by SQL text
+SQLITE_QUERIES = {
+    "last_bars": f"""
+        SELECT {", ".join(COLUMNS)} FROM stocks_data
+        WHERE symbol = ? ORDER BY trade_timestamp_utc DESC LIMIT ?;
+    """,
+    "day_range": f"""
+        SELECT {", ".join(COLUMNS)} FROM stocks_data
+        WHERE symbol = ? AND trade_timestamp_utc >= ? AND trade_timestamp_utc < ?
+        ORDER BY trade_timestamp_utc;
+    """,
+}
+
+
+class CdcWatermarks:
+    """
+    Reads per-symbol watermarks from the CDC JSON file, re-parsing it only when
+    the file changes (checked with one stat() per lookup).
+
+    A watermark is (CDC timestamp, data version): load_data and catch-up
+    advance the timestamp, backfill bumps the version (see Load_psql.bump_version).
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_settings().cdc_path
+        self._mtime = None
+        self._watermarks = {}
+        self._lock = threading.Lock()
+
+    def get(self, symbol):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            # mtime has coarse granularity: a file modified within the last
+            # couple of seconds may change again without its mtime moving, so
+            # keep re-reading it until it has settled.
+            if mtime != self._mtime or time.time_ns() - mtime < RACY_MTIME_NS:
+                try:
+                    with open(self.path, "r") as f:
+                        self._watermarks = json.load(f)
+                    self._mtime = mtime
+                except json.JSONDecodeError:
+                    # Caught the file mid-write; keep the previous view and retry next time
+                    pass
+            cdc = self._watermarks.get(f"{symbol}_cdc")
+            version = self._watermarks.get(f"{symbol}_version", 0)
+            return None if cdc is None and not version else (cdc, version)
+
+
+class BarCache:
+    """
+    LRU cache of query results keyed by (symbol, interval, range).
+
+    Every entry remembers the symbol's watermark at the time it was filled.
+    When a writer advances that watermark (or bumps its data version), all
+    entries of that symbol (and only that symbol) are dropped on the next lookup.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (watermark, value)
+        self._by_symbol = {}  # symbol -> set of keys
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key, watermark):
+        symbol = key[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != watermark:
+                self._invalidate(symbol)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, watermark, value):
+        with self._lock:
+            self._entries[key] = (watermark, value)
+            self._entries.move_to_end(key)
+            self._by_symbol.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.maxsize:
+                old_key, _ = self._entries.popitem(last=False)
+                self._discard_index(old_key)
+
+    def invalidate(self, symbol):
+        with self._lock:
+            self._invalidate(symbol)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+    def _invalidate(self, symbol):
+        keys = self._by_symbol.pop(symbol, ())
+        for key in keys:
+            self._entries.pop(key, None)
+        if keys:
+            self.invalidations += 1
+
+    def _discard_index(self, key):
+        keys = self._by_symbol.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_symbol[key[0]]
+
+
+class StocksReader:
+    """
+    Read path over stocks_data: "last N bars" and "day range" queries with
+    prepared statements, pooled connections and a watermark-aware LRU cache.
+
+    Results are columnar: {"symbol", "interval", "columns": {name: [values]}}.
+    """
+
+    def __init__(self, sink="postgres", cache_size=DEFAULT_CACHE_SIZE, cdc_path=None, sqlite_path=None):
+        if sink not in ("postgres", "sqlite"):
+            raise ValueError(f"Unknown sink '{sink}'. Choose one of: postgres, sqlite")
+        self.sink = sink
+        self.sqlite_path = sqlite_path
+        self.cache = BarCache(cache_size)
+        self.watermarks = CdcWatermarks(cdc_path)
+        # Idle connections, each with its statements already prepared. The HTTP
+        # server runs every request on a fresh thread, so connections are pooled
+        # rather than thread-local.
+        self._idle = queue.LifoQueue()
+
+    def last_bars(self, symbol, n, interval="30min"):
+        """The most recent n bars of symbol, oldest first."""
+        n = int(n)
+        if n <= 0:
+            raise ValueError("n must be positive")
+        return self._cached(
+            (symbol, interval, ("last", n)),
+            lambda: list(reversed(self._query("last_bars", symbol, n))),
+        )
+
+    def day_range(self, symbol, start, end, interval="30min"):
+        """All bars of symbol from day start to day end (both inclusive, 'YYYY-MM-DD')."""
+        start_day = date.fromisoformat(str(start))
+        end_day = date.fromisoformat(str(end))
+        if end_day < start_day:
+            raise ValueError("end must not be before start")
+        return self._cached(
+            (symbol, interval, ("range", start_day.isoformat(), end_day.isoformat())),
+            lambda: self._query(
+                "day_range",
+                symbol,
+                start_day.isoformat(),
+                (end_day + timedelta(days=1)).isoformat(),
+            ),
+        )
+
+    def _cached(self, key, load_rows):
+        symbol, interval, _ = key
+        if interval not in INTERVALS:
+            raise ValueError(f"Unsupported interval '{interval}'. Choose one of: {', '.join(INTERVALS)}")
+
+        watermark = self.watermarks.get(symbol)
+        result = self.cache.get(key, watermark)
+        if result is None:
+            result = to_columns(symbol, interval, load_rows())
+            self.cache.put(key, watermark, result)
+        return result
+
+    def _query(self, name, *params):
+        conn = self._acquire()
+        try:
+            if self.sink == "postgres":
+                with conn.cursor() as cur:
+                    placeholders = ", ".join(["%s"] * len(params))
+                    cur.execute(f"EXECUTE {name}({placeholders});", params)
+                    rows = cur.fetchall()
+            else:
+                rows = conn.execute(SQLITE_QUERIES[name], params).fetchall()
+        except Exception:
+            conn.close()  # don't hand a broken connection to the next request
+            raise
+        self._idle.put(conn)
+        return rows
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        if self.sink == "postgres":
+            import psycopg2
+
+            conn = psycopg2.connect(**get_settings().db_config)
+            conn.autocommit = True  # read-only; no long-lived snapshot
+            with conn.cursor() as cur:
+                for statement in PG_PREPARE.values():
+                    cur.execute(statement)
+            return conn
+
+        import sqlite3
+        from ETL.sinks import SqliteSink
+
+        # Only ever used by one thread at a time (see _idle)
+        return sqlite3.connect(
+            SqliteSink(self.sqlite_path).path, timeout=60, check_same_thread=False
+        )
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def to_columns(symbol, interval, rows):
+    """Pivots row tuples (in COLUMNS order) into JSON-friendly column lists."""
+    columns = {name: [] for name in COLUMNS}
+    for row in rows:
+        ts, open_, high, low, close, volume = row
+        columns["trade_timestamp_utc"].append(ts.isoformat() if hasattr(ts, "isoformat") else ts)
+        columns["open"].append(float(open_))
+        columns["high"].append(float(high))
+        columns["low"].append(float(low))
+        columns["close"].append(float(close))
+        columns["volume"].append(int(volume))
+    return {"symbol": symbol, "interval": interval, "columns": columns}
+
+
+def to_arrow_ipc(result):
+    """
+    Encodes a columnar result as an Arrow IPC stream. Needs the optional pyarrow package.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("Arrow output needs pyarrow: pip install pyarrow") from None
+
+    columns = result["columns"]
+    table = pa.table(
+        {
+            "trade_timestamp_utc": pa.array(columns["trade_timestamp_utc"], pa.string()),
+            "open": pa.array(columns["open"], pa.float64()),
+            "high": pa.array(columns["high"], pa.float64()),
+            "low": pa.array(columns["low"], pa.float64()),
+            "close": pa.array(columns["close"], pa.float64()),
+            "volume": pa.array(columns["volume"], pa.int64()),
+        },
+        metadata={"symbol": result["symbol"], "interval": result["interval"]},
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _is_unavailable(error):
+    """
+    True if the database cannot be reached right now: a psycopg2 connection
+    error, or a locked SQLite file. Other sqlite3.OperationalErrors ("no such
+    table", bad SQL) are real failures.
+    """
+    import sqlite3
+
+    # Only loaded by the Postgres path; not imported here just to check
+    psycopg2 = sys.modules.get("psycopg2")
+    if psycopg2 is not None and isinstance(
+        error, (psycopg2.OperationalError, psycopg2.InterfaceError)
+    ):
+        return True
+    return isinstance(error, sqlite3.OperationalError) and "database is locked" in str(error)
+
+
+# --- HTTP endpoint ---
+def make_server(reader, host="127.0.0.1", port=8080):
+    """
+    Builds a threaded HTTP server over reader:
+
+        GET /bars?symbol=IBM&last=100[&interval=30min][&format=json|arrow]
+        GET /bars?symbol=IBM&start=2025-11-03&end=2025-11-07
+        GET /stats
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import urlparse, parse_qs
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+            if url.path == "/stats":
+                return self._send(200, "application/json", json.dumps(reader.cache.stats()).encode())
+            if url.path != "/bars":
+                return self._error(404, "Not found. Use /bars or /stats.")
+
+            symbol = params.get("symbol")
+            interval = params.get("interval", "30min")
+            try:
+                if not symbol:
+                    raise ValueError("symbol is required")
+                if "last" in params:
+                    result = reader.last_bars(symbol, params["last"], interval=interval)
+                elif "start" in params:
+                    result = reader.day_range(
+                        symbol, params["start"], params.get("end", params["start"]), interval=interval
+                    )
+                else:
+                    raise ValueError("pass either last=N or start=YYYY-MM-DD[&end=YYYY-MM-DD]")
+            except ValueError as e:
+                return self._error(400, str(e))
+            except Exception as e:
+                # Database errors must still produce a response, not a dropped connection
+                logger.exception(f"Query for {symbol} failed.")
+                if _is_unavailable(e):
+                    return self._error(503, f"Database unavailable: {e}")
+                return self._error(500, f"Query failed: {e}")
+
+            if params.get("format") == "arrow":
+                try:
+                    body = to_arrow_ipc(result)
+                except ImportError as e:
+                    return self._error(406, str(e))
+                return self._send(200, "application/vnd.apache.arrow.stream", body)
+            return self._send(200, "application/json", json.dumps(result).encode())
+
+        def _error(self, status, message):
+            self._send(status, "application/json", json.dumps({"error": message}).encode())
+
+        def _send(self, status, content_type, body):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return ThreadingHTTPServer((host, port), Handler)
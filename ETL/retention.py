@@ -0,0 +1,318 @@
+import os
+import logging
+from datetime import date, timedelta
+
+from utils.settings import get_settings
+
+# --- Logger Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# Prices are stored in the cold tier as integers of 1/10000 (DECIMAL(10, 4) has 4 decimals).
+# INTEGER caps them at 214748.3647: run() skips (symbol, month)s with a larger
+# price, with a warning, and they stay in stocks_data.
+PRICE_SCALE = 10000
+MAX_COLD_PRICE = (2**31 - 1) / PRICE_SCALE
+DEFAULT_RETENTION_DAYS = 365
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS symbols(
+        symbol_id SERIAL PRIMARY KEY,
+        symbol VARCHAR(20) NOT NULL UNIQUE);
+    """,
+    # Fixed-width columns only, widest first to avoid alignment padding:
+    # ~36 bytes of data per row instead of ~60 in stocks_data.
+    """
+    CREATE TABLE IF NOT EXISTS stocks_data_cold(
+        trade_timestamp_utc TIMESTAMPTZ NOT NULL,
+        volume BIGINT NOT NULL,
+        symbol_id INTEGER NOT NULL REFERENCES symbols(symbol_id),
+        open_e4 INTEGER NOT NULL,
+        high_e4 INTEGER NOT NULL,
+        low_e4 INTEGER NOT NULL,
+        close_e4 INTEGER NOT NULL,
+        PRIMARY KEY (symbol_id, trade_timestamp_utc))
+    PARTITION BY RANGE (trade_timestamp_utc);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stocks_data_daily(
+        symbol_id INTEGER NOT NULL REFERENCES symbols(symbol_id),
+        trade_date DATE NOT NULL,
+        open DECIMAL(10, 4) NOT NULL,
+        high DECIMAL(10, 4) NOT NULL,
+        low DECIMAL(10, 4) NOT NULL,
+        close DECIMAL(10, 4) NOT NULL,
+        volume BIGINT NOT NULL,
+        bars INTEGER NOT NULL,
+        PRIMARY KEY (symbol_id, trade_date));
+    """,
+    # Consumers that need the full history read this instead of stocks_data
+    f"""
+    CREATE OR REPLACE VIEW stocks_data_all AS
+    SELECT trade_timestamp_utc, symbol, open, high, low, close, volume
+    FROM stocks_data
+    UNION ALL
+    SELECT c.trade_timestamp_utc, s.symbol,
+        (c.open_e4 / {PRICE_SCALE}.0)::DECIMAL(10, 4),
+        (c.high_e4 / {PRICE_SCALE}.0)::DECIMAL(10, 4),
+        (c.low_e4 / {PRICE_SCALE}.0)::DECIMAL(10, 4),
+        (c.close_e4 / {PRICE_SCALE}.0)::DECIMAL(10, 4),
+        c.volume
+    FROM stocks_data_cold c
+    JOIN symbols s USING (symbol_id);
+    """,
+]
+
+# Distinct symbols via the (symbol, trade_timestamp_utc) unique index, one
+# index probe per symbol instead of a full scan of stocks_data
+HOT_SYMBOLS = """
+    WITH RECURSIVE hot_symbols AS (
+        (SELECT symbol FROM stocks_data ORDER BY symbol LIMIT 1)
+        UNION ALL
+        SELECT (SELECT symbol FROM stocks_data WHERE symbol > h.symbol ORDER BY symbol LIMIT 1)
+        FROM hot_symbols h
+        WHERE h.symbol IS NOT NULL
+    )
+    SELECT symbol FROM hot_symbols WHERE symbol IS NOT NULL;
+"""
+
+# Filtering on symbol as well keeps every move on the unique index
+MOVE_MONTH = f"""
+    WITH moved AS (
+        DELETE FROM stocks_data
+        WHERE symbol = %(symbol)s
+            AND trade_timestamp_utc >= %(start)s AND trade_timestamp_utc < %(end)s
+        RETURNING *
+    )
+    INSERT INTO stocks_data_cold
+        (trade_timestamp_utc, volume, symbol_id, open_e4, high_e4, low_e4, close_e4)
+    SELECT m.trade_timestamp_utc, m.volume, s.symbol_id,
+        round(m.open * {PRICE_SCALE}), round(m.high * {PRICE_SCALE}),
+        round(m.low * {PRICE_SCALE}), round(m.close * {PRICE_SCALE})
+    FROM moved m
+    JOIN symbols s USING (symbol)
+    ON CONFLICT (symbol_id, trade_timestamp_utc) DO NOTHING;
+"""
+
+# Recomputed from the cold tier, so re-running a month (e.g. after a late
+# backfill added rows to it) gives the same result.
+ROLLUP_MONTH = f"""
+    INSERT INTO stocks_data_daily
+        (symbol_id, trade_date, open, high, low, close, volume, bars)
+    SELECT symbol_id,
+        trade_timestamp_utc::date,
+        ((array_agg(open_e4 ORDER BY trade_timestamp_utc))[1] / {PRICE_SCALE}.0)::DECIMAL(10, 4),
+        (max(high_e4) / {PRICE_SCALE}.0)::DECIMAL(10, 4),
+        (min(low_e4) / {PRICE_SCALE}.0)::DECIMAL(10, 4),
+        ((array_agg(close_e4 ORDER BY trade_timestamp_utc DESC))[1] / {PRICE_SCALE}.0)::DECIMAL(10, 4),
+        sum(volume),
+        count(*)
+    FROM stocks_data_cold
+    WHERE symbol_id = (SELECT symbol_id FROM symbols WHERE symbol = %(symbol)s)
+        AND trade_timestamp_utc >= %(start)s AND trade_timestamp_utc < %(end)s
+    GROUP BY symbol_id, trade_timestamp_utc::date
+    ON CONFLICT (symbol_id, trade_date) DO UPDATE SET
+        open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low,
+        close = EXCLUDED.close, volume = EXCLUDED.volume, bars = EXCLUDED.bars;
+"""
+
+
+def retention_cutoff(older_than_days, today=None):
+    """
+    First day of the month containing (today - older_than_days). Whole months
+    move together, so a trading day is never split across tiers.
+    """
+    today = today or date.today()
+    return (today - timedelta(days=older_than_days)).replace(day=1)
+
+
+def month_ranges(first, cutoff):
+    """Yields (month_start, next_month_start) dates from first's month up to cutoff."""
+    start = first.replace(day=1)
+    while start < cutoff:
+        following = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        yield start, following
+        start = following
+
+
+def ensure_schema(cur):
+    for statement in SCHEMA:
+        cur.execute(statement)
+
+
+def ensure_partition(cur, year):
+    """Creates the yearly partition of stocks_data_cold if it is missing."""
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS stocks_data_cold_{year:04d}
+        PARTITION OF stocks_data_cold
+        FOR VALUES FROM ('{year:04d}-01-01') TO ('{year + 1:04d}-01-01');
+        """
+    )
+
+
+def relation_sizes(cur):
+    """Total on-disk size (incl. indexes and TOAST) of the tiers, in bytes."""
+    cur.execute(
+        """
+        SELECT relname, pg_total_relation_size(c.oid)
+        FROM pg_class c
+        WHERE relname IN ('stocks_data', 'stocks_data_daily', 'symbols')
+        UNION ALL
+        SELECT 'stocks_data_cold', coalesce(sum(pg_total_relation_size(inhrelid)), 0)
+        FROM pg_inherits
+        WHERE inhparent = 'stocks_data_cold'::regclass;
+        """
+    )
+    return {name: int(size) for name, size in cur.fetchall()}
+
+
+def move_month(conn, symbol, start, end):
+    """
+    Moves one month of a symbol's stocks_data rows into the cold tier and
+    refreshes their daily rollups, in a single transaction. Returns the number
+    of rows moved.
+    """
+    params = {"symbol": symbol, "start": start.isoformat(), "end": end.isoformat()}
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO symbols (symbol) VALUES (%(symbol)s) ON CONFLICT (symbol) DO NOTHING;",
+                params,
+            )
+            ensure_partition(cur, start.year)
+            cur.execute(MOVE_MONTH, params)
+            moved = cur.rowcount
+            cur.execute(ROLLUP_MONTH, params)
+    return moved
+
+
+def export_parquet(conn, symbol, start, end, output_dir):
+    """
+    Writes one cold month of a symbol to
+    output_dir/symbol=X/year=YYYY/month=MM/stocks_data.parquet (zstd compressed).
+    Needs the optional pyarrow package.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow") from None
+
+    schema = pa.schema(
+        [
+            ("trade_timestamp_utc", pa.timestamp("us", tz="UTC")),
+            ("symbol", pa.string()),
+            ("open_e4", pa.int32()),
+            ("high_e4", pa.int32()),
+            ("low_e4", pa.int32()),
+            ("close_e4", pa.int32()),
+            ("volume", pa.int64()),
+        ],
+        metadata={"price_scale": str(PRICE_SCALE)},
+    )
+    path = os.path.join(
+        output_dir, f"symbol={symbol}", f"year={start.year:04d}", f"month={start.month:02d}"
+    )
+    os.makedirs(path, exist_ok=True)
+    path = os.path.join(path, "stocks_data.parquet")
+
+    rows = 0
+    with conn.cursor(name=f"export_{start:%Y%m}") as cur:
+        cur.itersize = 50000
+        cur.execute(
+            """
+            SELECT c.trade_timestamp_utc, s.symbol, c.open_e4, c.high_e4, c.low_e4, c.close_e4, c.volume
+            FROM stocks_data_cold c JOIN symbols s USING (symbol_id)
+            WHERE s.symbol = %s AND c.trade_timestamp_utc >= %s AND c.trade_timestamp_utc < %s
+            ORDER BY c.trade_timestamp_utc;
+            """,
+            (symbol, start.isoformat(), end.isoformat()),
+        )
+        with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+            while True:
+                batch = cur.fetchmany(cur.itersize)
+                if not batch:
+                    break
+                writer.write_table(pa.Table.from_pylist(
+                    [dict(zip(schema.names, row)) for row in batch], schema=schema
+                ))
+                rows += len(batch)
+    conn.commit()
+    logger.info(f"Exported {rows} cold rows of {symbol} for {start:%Y-%m} to {path}")
+    return rows
+
+
+def run(older_than_days=DEFAULT_RETENTION_DAYS, parquet_dir=None, vacuum=False, today=None):
+    """
+    Moves every month older than the retention window from stocks_data into the
+    cold tier, one transaction per symbol and month, and reports the size of
+    each tier. Months with a price above MAX_COLD_PRICE are skipped with a warning.
+
+    Returns:
+        (int) rows moved.
+    """
+    import psycopg2
+    from psycopg2 import errors
+
+    cutoff = retention_cutoff(older_than_days, today)
+    conn = psycopg2.connect(**get_settings().db_config)
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                ensure_schema(cur)
+                before = relation_sizes(cur)
+                cur.execute(HOT_SYMBOLS)
+                symbols = [symbol for (symbol,) in cur.fetchall()]
+
+        total = 0
+        for symbol in symbols:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "SELECT min(trade_timestamp_utc)::date FROM stocks_data WHERE symbol = %s;",
+                        (symbol,),
+                    )
+                    first = cur.fetchone()[0]
+            if first is None or first >= cutoff:
+                continue
+
+            moved_symbol = 0
+            for start, end in month_ranges(first, cutoff):
+                try:
+                    moved = move_month(conn, symbol, start, end)
+                except errors.NumericValueOutOfRange:
+                    # The transaction was rolled back, so the month is still in stocks_data
+                    logger.warning(
+                        f"{symbol} {start:%Y-%m} has a price above {MAX_COLD_PRICE}; "
+                        "it does not fit the cold tier and stays in stocks_data."
+                    )
+                    continue
+                moved_symbol += moved
+                if parquet_dir and moved:
+                    export_parquet(conn, symbol, start, end, parquet_dir)
+            total += moved_symbol
+            logger.info(f"Moved {moved_symbol} rows of {symbol} older than {cutoff} to the cold tier.")
+
+        if not total:
+            logger.info(f"Nothing older than {cutoff} in stocks_data.")
+
+        if vacuum:
+            # Lets the freed pages be reused and refreshes planner stats; the
+            # file itself only shrinks with VACUUM FULL / pg_repack.
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute("VACUUM (ANALYZE) stocks_data;")
+            conn.autocommit = False
+
+        with conn:
+            with conn.cursor() as cur:
+                after = relation_sizes(cur)
+        for name in sorted(after):
+            logger.info(
+                f"{name}: {before.get(name, 0) / 1e6:.1f} MB -> {after[name] / 1e6:.1f} MB"
+            )
+        return total
+    finally:
+        conn.close()
@@ -0,0 +1,366 @@
+import os
+import json
+import heapq
+import math
+import time
+import logging
+from datetime import datetime, timedelta
+
+from utils.settings import get_settings
+
+# --- Logger Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+FORMAT_CODE = "%Y-%m-%d %H:%M:%S"
+DEFAULT_START_MONTH = "2000-01"
+# Weight of the latest outcome in the failure-rate moving average
+FAILURE_ALPHA = 0.3
+# Symbols that keep failing still get a share of the quota, just a small one
+MIN_SUCCESS_WEIGHT = 0.1
+
+
+class SchedulerState:
+    """
+    Per-symbol call history persisted between runs:
+    {symbol: {"attempts", "failures", "failure_rate", "last_attempt", "last_success",
+    "complete_through"}}.
+
+    complete_through is the last month catch-up has stored completely. It is
+    kept here rather than derived from the CDC watermark, which incremental
+    runs move to the newest bar without filling the months in between.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_settings().scheduler_state_path
+        try:
+            with open(path, "r") as f:
+                self.symbols = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.symbols = {}
+
+    def failure_rate(self, symbol):
+        return self.symbols.get(symbol, {}).get("failure_rate", 0.0)
+
+    def _entry(self, symbol):
+        return self.symbols.setdefault(
+            symbol, {"attempts": 0, "failures": 0, "failure_rate": 0.0}
+        )
+
+    def complete_through(self, symbol):
+        return self.symbols.get(symbol, {}).get("complete_through")
+
+    def track(self, symbol, watermark, start_month=DEFAULT_START_MONTH):
+        """
+        Starts tracking a symbol that catch-up has not seen yet, from its CDC
+        watermark: the watermark's month counts as complete only if the
+        watermark is at its very end.
+        """
+        if self.complete_through(symbol) is not None:
+            return
+        if watermark is None:
+            through = previous_month(start_month)
+        elif watermark >= month_end(watermark.strftime("%Y-%m")):
+            through = watermark.strftime("%Y-%m")
+        else:
+            through = previous_month(watermark.strftime("%Y-%m"))
+        self._entry(symbol)["complete_through"] = through
+
+    def mark_complete(self, symbol, month):
+        entry = self._entry(symbol)
+        if entry.get("complete_through") is None or month > entry["complete_through"]:
+            entry["complete_through"] = month
+
+    def record(self, symbol, ok, now=None):
+        now = (now or datetime.now()).strftime(FORMAT_CODE)
+        entry = self._entry(symbol)
+        entry["attempts"] += 1
+        entry["last_attempt"] = now
+        if ok:
+            entry["last_success"] = now
+        else:
+            entry["failures"] += 1
+        entry["failure_rate"] = round(
+            (1 - FAILURE_ALPHA) * entry["failure_rate"] + FAILURE_ALPHA * (0.0 if ok else 1.0),
+            4,
+        )
+
+    def save(self):
+        # Write to a temp file and swap, so a crash never leaves half a file behind
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.symbols, f, indent=4)
+        os.replace(tmp_path, self.path)
+
+
+def load_watermarks(symbols, path):
+    """Returns {symbol: datetime or None} from the CDC JSON file."""
+    try:
+        with open(path, "r") as f:
+            cdc = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        cdc = {}
+
+    watermarks = {}
+    for symbol in symbols:
+        try:
+            watermarks[symbol] = datetime.strptime(cdc[f"{symbol}_cdc"], FORMAT_CODE)
+        except (KeyError, TypeError, ValueError):
+            watermarks[symbol] = None
+    return watermarks
+
+
+def month_start(year_month):
+    return datetime.strptime(year_month, "%Y-%m")
+
+
+def month_end(year_month):
+    """Last second of the month."""
+    start = month_start(year_month)
+    following = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return following - timedelta(seconds=1)
+
+
+def previous_month(year_month):
+    return (month_start(year_month) - timedelta(days=1)).strftime("%Y-%m")
+
+
+def next_month(year_month):
+    return (month_end(year_month) + timedelta(seconds=1)).strftime("%Y-%m")
+
+
+def catch_up_positions(symbols, watermarks, state, start_month=DEFAULT_START_MONTH):
+    """
+    Where each symbol's stored history is known to be complete up to, for
+    planning: the end of the state's complete_through month, or the CDC
+    watermark if it lies in the month right after it (an incremental run
+    fetches the whole current month). A watermark further ahead is not
+    trusted: the months in between were never fetched.
+
+    Symbols the state does not track yet are tracked from their watermark
+    (in memory; run() persists it).
+
+    Returns:
+        {symbol: datetime}
+    """
+    positions = {}
+    for symbol in symbols:
+        watermark = watermarks.get(symbol)
+        state.track(symbol, watermark, start_month)
+        through = state.complete_through(symbol)
+        if watermark is not None and watermark.strftime("%Y-%m") == next_month(through):
+            positions[symbol] = watermark
+        else:
+            positions[symbol] = month_end(through)
+    return positions
+
+
+def months_to_fetch(watermark, now, start_month=DEFAULT_START_MONTH):
+    """
+    Months still needed to bring a symbol up to now: from the watermark's
+    month (or start_month if there is none) through the current month.
+    Every month is one API call.
+    """
+    current = watermark if watermark is not None else month_start(start_month)
+    months = []
+    year, month = current.year, current.month
+    while (year, month) <= (now.year, now.month):
+        months.append(f"{year}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    # A watermark at the very end of its month has nothing left to fetch there
+    if watermark is not None and months and watermark >= month_end(months[0]):
+        months.pop(0)
+    return months
+
+
+def _lag(watermark, now, start_month):
+    reference = watermark if watermark is not None else month_start(start_month)
+    return max((now - reference).total_seconds(), 0.0)
+
+
+def plan(symbols, watermarks, state, quota, now=None, start_month=DEFAULT_START_MONTH):
+    """
+    Allocates up to `quota` API calls across symbols.
+
+    Each call fetches one month and moves the symbol's watermark to the end of
+    that month. Calls always go to the symbol with the highest
+    lag x expected success (1 - failure rate), re-scored after every simulated
+    call, so the most-behind symbols are levelled down first and flaky symbols
+    do not burn quota that would reduce staleness elsewhere.
+
+    Returns:
+        A list of (symbol, year_month) in the order they should be called.
+    """
+    now = now or datetime.now()
+    heap = []
+    pending = {}
+    for symbol in symbols:
+        months = months_to_fetch(watermarks.get(symbol), now, start_month)
+        if not months:
+            continue
+        pending[symbol] = months
+        weight = max(1.0 - state.failure_rate(symbol), MIN_SUCCESS_WEIGHT)
+        lag = _lag(watermarks.get(symbol), now, start_month)
+        # heapq is a min-heap; symbol name breaks ties deterministically
+        heapq.heappush(heap, (-lag * weight, symbol, 0, weight))
+
+    calls = []
+    while heap and len(calls) < quota:
+        _, symbol, index, weight = heapq.heappop(heap)
+        month = pending[symbol][index]
+        calls.append((symbol, month))
+        if index + 1 < len(pending[symbol]):
+            lag_after = _lag(min(month_end(month), now), now, start_month)
+            heapq.heappush(heap, (-lag_after * weight, symbol, index + 1, weight))
+    return calls
+
+
+def project(symbols, watermarks, state, calls_per_day, now=None, start_month=DEFAULT_START_MONTH):
+    """
+    Estimates when every symbol will be fully fresh at calls_per_day.
+
+    Returns:
+        A dict with remaining_calls, expected_calls (accounting for failure
+        rates), days, eta (datetime or None) and the current mean staleness in days.
+    """
+    now = now or datetime.now()
+    remaining = 0
+    expected = 0.0
+    staleness = []
+    for symbol in symbols:
+        watermark = watermarks.get(symbol)
+        calls = len(months_to_fetch(watermark, now, start_month))
+        remaining += calls
+        expected += calls / max(1.0 - state.failure_rate(symbol), MIN_SUCCESS_WEIGHT)
+        staleness.append(_lag(watermark, now, start_month) / 86400)
+
+    days = math.ceil(expected / calls_per_day) if calls_per_day > 0 else None
+    return {
+        "remaining_calls": remaining,
+        "expected_calls": math.ceil(expected),
+        "days": days,
+        "eta": now + timedelta(days=days) if days is not None else None,
+        "mean_staleness_days": sum(staleness) / len(staleness) if staleness else 0.0,
+    }
+
+
+def run(
+    symbols,
+    quota,
+    sink=None,
+    dry_run=False,
+    delay=None,
+    start_month=DEFAULT_START_MONTH,
+    state_path=None,
+    now=None,
+):
+    """
+    Plans and executes one quota's worth of calls from each symbol's catch-up
+    position (see catch_up_positions), advancing it and the CDC watermark month
+    by month and persisting the scheduler state after every call.
+    With dry_run, months are fetched and parsed but nothing is written or persisted.
+    A rate-limit answer ("Note"/"Information") ends the run early; it counts as
+    a failed call but is not held against the symbol.
+
+    Returns:
+        (int) successful calls, (int) failed calls.
+    """
+    from ETL.backFill_api_pipeline import API_CALL_DELAY_SECONDS, fetch_batches
+    from ETL.Load_psql import bump_version, update_cdc
+    from ETL.stream_parser import ApiError
+    from utils.profiling import stage
+
+    settings = get_settings()
+    delay = API_CALL_DELAY_SECONDS if delay is None else delay
+    now = now or datetime.now()
+    state = SchedulerState(state_path)
+    watermarks = load_watermarks(symbols, settings.cdc_path)
+    positions = catch_up_positions(symbols, watermarks, state, start_month)
+    if not dry_run:
+        state.save()
+    current_month = now.strftime("%Y-%m")
+
+    planned = plan(symbols, positions, state, quota, now=now, start_month=start_month)
+    logger.info(f"Planned {len(planned)} call(s): {', '.join(f'{s} {m}' for s, m in planned)}")
+
+    # Re-plan before every call: a failure blocks that symbol for the rest of
+    # the run (its later months must not overtake the missing one), and the
+    # quota it would have used goes to the next most-behind symbol instead.
+    blocked = set()
+    succeeded = failed = 0
+    while succeeded + failed < quota:
+        next_call = plan(
+            [s for s in symbols if s not in blocked],
+            positions,
+            state,
+            1,
+            now=now,
+            start_month=start_month,
+        )
+        if not next_call:
+            break
+        symbol, month = next_call[0]
+
+        if succeeded + failed:
+            # --- Rate Limit Protection ---
+            time.sleep(delay)
+
+        newest = None
+        inserted = 0
+        try:
+            for batch in fetch_batches(symbol, month, raise_api_errors=True):
+                batch_newest = max(row[0] for row in batch)
+                newest = max(newest or batch_newest, batch_newest)
+                if not dry_run:
+                    with stage("load"):
+                        inserted += sink.write(symbol, batch)
+        except Exception as e:
+            failed += 1
+            if inserted:
+                # Batches written before the failure stay; cached reads must see them
+                bump_version(symbol, path=settings.cdc_path)
+            if isinstance(e, ApiError) and e.rate_limited:
+                # The key's quota is used up: every further call would fail the
+                # same way, and it is not this symbol's fault, so stop here
+                # without touching its failure rate.
+                logger.warning(f"Rate limit reached at {symbol} {month}; stopping this run: {e}")
+                break
+            # A real error for this symbol (bad request, broken stream)
+            logger.error(f"{symbol} {month} failed: {e}")
+            blocked.add(symbol)
+            if not dry_run:
+                state.record(symbol, ok=False)
+                state.save()
+            continue
+
+        succeeded += 1
+
+        # A past month is complete once fetched (even if empty, e.g. before
+        # listing), so the position moves to its end and it is never fetched
+        # again. In the current month it moves to the newest bar, and the
+        # symbol is up to date for this run.
+        if month < current_month:
+            newest = month_end(month).strftime(FORMAT_CODE)
+            state.mark_complete(symbol, month)
+        else:
+            blocked.add(symbol)
+        if newest is not None:
+            positions[symbol] = max(positions[symbol], datetime.strptime(newest, FORMAT_CODE))
+        # The CDC watermark only moves forward: a gap filled below it (after
+        # an incremental run went ahead) leaves it where it is, so the data
+        # version is bumped instead for the read API's cache
+        if newest is not None and (
+            watermarks[symbol] is None or newest > watermarks[symbol].strftime(FORMAT_CODE)
+        ):
+            watermarks[symbol] = datetime.strptime(newest, FORMAT_CODE)
+            if not dry_run:
+                update_cdc(symbol, newest, path=settings.cdc_path)
+        elif inserted:
+            bump_version(symbol, path=settings.cdc_path)
+
+        if not dry_run:
+            state.record(symbol, ok=True)
+            state.save()
+
+    return succeeded, failed
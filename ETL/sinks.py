@@ -0,0 +1,263 @@
+import os
+import logging
+import threading
+from datetime import datetime
+
+from utils.settings import get_settings
+
+# --- Logger Setup ---
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+FORMAT_CODE = "%Y-%m-%d %H:%M:%S"
+
+
+class PostgresSink:
+    """
+    Writes rows into the stocks_data table in PostgreSQL and publishes newly
+    inserted rows to the CDC outbox (see ETL/cdc_outbox.py).
+    """
+
+    name = "postgres"
+
+    def __init__(self, db_config=None, feed_sinks=None):
+        settings = get_settings()
+        self.db_config = db_config or settings.db_config
+        self.feed_sinks = (
+            settings.cdc_feed_sinks if feed_sinks is None else tuple(feed_sinks)
+        )
+        self._schema_ready = False
+        # One sink is shared by all --concurrency workers; only one creates the schema
+        self._schema_lock = threading.Lock()
+
+    def _connect(self):
+        import psycopg2
+
+        # `with conn:` only ends the transaction; callers close the connection themselves
+        return psycopg2.connect(**self.db_config)
+
+    def ensure_schema(self):
+        """
+        Creates stocks_data, the outbox and the composite unique constraint, plus
+        the (empty) retention tiers and the stocks_data_all view, once per sink.
+        """
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if not self._schema_ready:
+                self._create_schema()
+                self._schema_ready = True
+
+    def _create_schema(self):
+        from ETL import retention
+        from ETL.cdc_outbox import ensure_outbox
+
+        conn = self._connect()
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                # A new table gets the composite unique constraint ON CONFLICT relies on
+                cur.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS stocks_data(
+                    trade_timestamp_utc TIMESTAMPTZ NOT NULL,
+                    symbol VARCHAR(20) NOT NULL,
+                    open DECIMAL(10, 4) NOT NULL,
+                    high DECIMAL(10, 4) NOT NULL,
+                    low DECIMAL(10, 4) NOT NULL,
+                    close DECIMAL(10, 4) NOT NULL,
+                    volume BIGINT NOT NULL,
+                    CONSTRAINT symbol_trade_timestamp_utc_unique UNIQUE (symbol, trade_timestamp_utc));
+                    """
+                )
+
+                # Tables created by older versions: drop the old, incorrect
+                # timestamp-only constraint and add the composite one if missing
+                cur.execute(
+                    "ALTER TABLE stocks_data DROP CONSTRAINT IF EXISTS trade_timestamp_utc_unique;"
+                )
+                cur.execute(
+                    """
+                    SELECT 1 FROM pg_constraint
+                    WHERE conrelid = 'stocks_data'::regclass
+                        AND conname = 'symbol_trade_timestamp_utc_unique';
+                    """
+                )
+                if cur.fetchone() is None:
+                    cur.execute(
+                        "ALTER TABLE stocks_data ADD CONSTRAINT symbol_trade_timestamp_utc_unique UNIQUE (symbol, trade_timestamp_utc);"
+                    )
+                    logger.info(
+                        "Added composite UNIQUE constraint on 'symbol' and 'trade_timestamp_utc'."
+                    )
+
+                ensure_outbox(cur)
+                # Readers query stocks_data_all, so it must exist before retention first runs
+                retention.ensure_schema(cur)
+        finally:
+            conn.close()
+
+    def write(self, symbol, rows):
+        """
+        Inserts rows, skipping ones that already exist.
+
+        Args:
+            symbol (str): The stock ticker the rows belong to.
+            rows (list): Tuples of (timestamp, symbol, open, high, low, close, volume).
+
+        Returns:
+            (int) number of rows actually inserted.
+        """
+        from psycopg2.extras import execute_values
+        from ETL.cdc_outbox import append_to_log, publish_changes
+
+        self.ensure_schema()
+
+        # The unique constraint only sees stocks_data, so rows already moved to
+        # the cold tier (ETL/retention.py) are filtered out explicitly.
+        insert_query = """
+                        INSERT INTO stocks_data (trade_timestamp_utc, symbol, open, high, low, close, volume)
+                        SELECT v.trade_timestamp_utc::timestamptz, v.symbol, v.open, v.high, v.low, v.close, v.volume
+                        FROM (VALUES %s) AS v(trade_timestamp_utc, symbol, open, high, low, close, volume)
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM stocks_data_cold c JOIN symbols s USING (symbol_id)
+                            WHERE s.symbol = v.symbol
+                                AND c.trade_timestamp_utc = v.trade_timestamp_utc::timestamptz)
+                        ON CONFLICT (symbol, trade_timestamp_utc) DO NOTHING
+                        RETURNING trade_timestamp_utc, symbol, open, high, low, close, volume;
+                        """
+
+        conn = self._connect()
+        try:
+            with conn.cursor() as cur:
+                # RETURNING only yields rows that were actually inserted,
+                # which is exactly the set of changes to publish downstream.
+                new_rows = execute_values(cur, insert_query, rows, fetch=True)
+                change_ids = publish_changes(cur, symbol, new_rows, sinks=self.feed_sinks)
+
+            # saving
+            conn.commit()
+            logger.info("Committed the changes")
+        finally:
+            # Closing without commit rolls the transaction back
+            conn.close()
+
+        # Only committed changes go to the file stream
+        if "file" in self.feed_sinks and new_rows:
+            append_to_log(get_settings().cdc_log_path, new_rows, change_ids)
+
+        return len(new_rows)
+
+    def timestamps(self, symbol):
+        """Yields the stored timestamps of a symbol in ascending order, cold tier included."""
+        self.ensure_schema()
+        conn = self._connect()
+        try:
+            # Named (server-side) cursor so a full history is streamed, not loaded at once
+            with conn.cursor(name=f"timestamps_{symbol}") as cur:
+                cur.itersize = 10000
+                cur.execute(
+                    "SELECT trade_timestamp_utc FROM stocks_data_all WHERE symbol = %s ORDER BY trade_timestamp_utc;",
+                    (symbol,),
+                )
+                for (ts,) in cur:
+                    yield ts
+        finally:
+            conn.close()
+
+
+class SqliteSink:
+    """
+    Writes rows into a local SQLite file with the same stocks_data layout.
+    Meant for local runs and tests; it does not publish to the CDC outbox.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path=None):
+        self.path = path or get_settings().sqlite_path
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connect(self):
+        import sqlite3
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Generous timeout: concurrent symbol loads share one file lock
+        return sqlite3.connect(self.path, timeout=60)
+
+    def ensure_schema(self):
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS stocks_data(
+                        trade_timestamp_utc TEXT NOT NULL,
+                        symbol TEXT NOT NULL,
+                        open REAL NOT NULL,
+                        high REAL NOT NULL,
+                        low REAL NOT NULL,
+                        close REAL NOT NULL,
+                        volume INTEGER NOT NULL,
+                        UNIQUE (symbol, trade_timestamp_utc));
+                        """
+                    )
+            finally:
+                conn.close()
+            self._schema_ready = True
+
+    def write(self, symbol, rows):
+        """Inserts rows, skipping existing ones. Returns the number inserted."""
+        self.ensure_schema()
+        conn = self._connect()
+        try:
+            with conn:
+                before = conn.total_changes
+                conn.executemany(
+                    """
+                    INSERT OR IGNORE INTO stocks_data (trade_timestamp_utc, symbol, open, high, low, close, volume)
+                    VALUES (?, ?, ?, ?, ?, ?, ?);
+                    """,
+                    rows,
+                )
+                return conn.total_changes - before
+        finally:
+            conn.close()
+
+    def timestamps(self, symbol):
+        """Yields the stored timestamps of a symbol in ascending order."""
+        self.ensure_schema()
+        conn = self._connect()
+        try:
+            cur = conn.execute(
+                "SELECT trade_timestamp_utc FROM stocks_data WHERE symbol = ? ORDER BY trade_timestamp_utc;",
+                (symbol,),
+            )
+            for (ts,) in cur:
+                yield datetime.strptime(ts, FORMAT_CODE)
+        finally:
+            conn.close()
+
+
+SINKS = {
+    PostgresSink.name: PostgresSink,
+    SqliteSink.name: SqliteSink,
+}
+
+
+def get_sink(name="postgres", **kwargs):
+    """
+    Returns a sink instance by name ('postgres' or 'sqlite').
+    """
+    try:
+        return SINKS[name](**kwargs)
+    except KeyError:
+        raise ValueError(
+            f"Unknown sink '{name}'. Choose one of: {', '.join(SINKS)}"
+        ) from None
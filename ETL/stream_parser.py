@@ -0,0 +1,143 @@
+import re
+import json
+import codecs
+from itertools import islice
+
+# --- Constants ---
+FORMAT_CODE = "%Y-%m-%d %H:%M:%S"
+CHUNK_SIZE = 64 * 1024
+BATCH_SIZE = 5000
+WHITESPACE = " \t\n\r"
+
+_decoder = json.JSONDecoder()
+
+
+class ApiError(Exception):
+    """
+    The response did not contain the time series (rate limit "Note",
+    "Information" or "Error Message" payloads).
+
+    `kind` is the payload key. "Note" and "Information" mean the API key's
+    quota is used up (rate_limited); "Error Message" is about the request itself.
+    """
+
+    def __init__(self, message, kind="Error Message"):
+        super().__init__(message)
+        self.kind = kind
+
+    @property
+    def rate_limited(self):
+        return self.kind in ("Note", "Information")
+
+
+def iter_time_series(chunks, key):
+    """
+    Incrementally parses an AlphaVantage response and yields the entries of
+    the time series object one by one, without ever holding the whole body.
+
+    At most one chunk plus one partial entry is buffered, so memory stays flat
+    regardless of month size or interval. Everything before the time series
+    (the small "Meta Data" block) is skipped.
+
+    Args:
+        chunks (iterable): bytes (or str) chunks of the response body, e.g. r.iter_content().
+        key (str): The time series key, e.g. "Time Series (30min)".
+
+    Yields:
+        (str) timestamp, (dict) values, in response order.
+
+    Raises:
+        ApiError: If the body is valid JSON without the time series key.
+        ValueError: If the body is truncated or malformed.
+    """
+    start_pattern = re.compile(re.escape(json.dumps(key)) + r"\s*:\s*\{")
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buf = ""
+    exhausted = False
+
+    def read_more():
+        nonlocal buf, exhausted
+        for chunk in chunks:
+            text = utf8.decode(chunk) if isinstance(chunk, bytes) else chunk
+            if text:
+                buf += text
+                return True
+        buf += utf8.decode(b"", final=True)
+        exhausted = True
+        return False
+
+    # 1. Find the start of the time series object
+    while True:
+        match = start_pattern.search(buf)
+        if match:
+            pos = match.end()
+            break
+        if not read_more():
+            # Error payloads are tiny, so parsing the whole buffer here is fine
+            try:
+                payload = json.loads(buf)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Malformed API response: {e}") from None
+            for kind in ("Note", "Information", "Error Message"):
+                if payload.get(kind):
+                    raise ApiError(payload[kind], kind=kind)
+            raise ApiError("Unknown API error.")
+
+    # 2. Decode one "timestamp": {...} member at a time
+    while True:
+        while pos < len(buf) and buf[pos] in WHITESPACE + ",":
+            pos += 1
+        if pos < len(buf) and buf[pos] == "}":
+            return
+        try:
+            timestamp, end = _decoder.raw_decode(buf, pos)
+            while end < len(buf) and buf[end] in WHITESPACE:
+                end += 1
+            if end >= len(buf):
+                raise json.JSONDecodeError("Incomplete member", buf, end)
+            if buf[end] != ":":
+                raise ValueError(f"Malformed API response near: {buf[pos:end + 20]!r}")
+            end += 1
+            while end < len(buf) and buf[end] in WHITESPACE:
+                end += 1
+            values, end = _decoder.raw_decode(buf, end)
+        except json.JSONDecodeError:
+            # Most likely the member is split across chunks. Drop what has been
+            # consumed, so the buffer never holds more than one chunk plus one
+            # partial member, then read on and retry.
+            buf, pos = buf[pos:], 0
+            if exhausted or not read_more():
+                raise ValueError("Truncated API response.") from None
+            continue
+
+        pos = end
+        yield timestamp, values
+
+
+def iter_rows(chunks, key, symbol, since=None):
+    """
+    Turns a streamed response into stocks_data rows:
+    (timestamp, symbol, open, high, low, close, volume).
+
+    Args:
+        since (datetime): If given, only entries at or after this time are returned.
+    """
+    # Timestamps are fixed-width "YYYY-MM-DD HH:MM:SS", so string comparison
+    # orders them correctly without parsing every one of them
+    since_str = since.strftime(FORMAT_CODE) if since is not None else None
+    for timestamp, values in iter_time_series(chunks, key):
+        if since_str is not None and timestamp < since_str:
+            continue
+        # Values keep the API order: "1. open", "2. high", "3. low", "4. close", "5. volume"
+        yield (timestamp, symbol, *(float(v) for v in values.values()))
+
+
+def batched(iterable, size=BATCH_SIZE):
+    """Yields lists of at most `size` items."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
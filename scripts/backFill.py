@@ -10,6 +10,7 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
 from utils.send_email import send_mail
+from ETL.cli import read_symbols
 
 # --- Logging Setup ---
 # Get current time
@@ -54,35 +55,8 @@ if not logger.handlers:
 # --- Main script ---
 logger.info("Backfilling script started.")
 
-# Paths
-LOAD_PSQL_PATH = os.path.join(project_root, "ETL", "Load_psql.py")
-
-# Top 20 Symmbols
-symbols = [
-    "NVDA",
-    "AAPL",
-    "GOOGL",
-    "MSFT",
-    "AMZN",
-    "AVGO",
-    "META",
-    "TSM",
-    "TSLA",
-    "BRK-B",
-    "LLY",
-    "WMT",
-    "JPM",
-    "TCEHY",
-    "V",
-    "ORCL",
-    "JNJ",
-    "MA",
-    "XOM",
-    "IBM",
-    "NFLX",
-    "COST",
-    "BABA",
-]
+# Symbols to backfill (one per line)
+symbols = read_symbols(os.path.join(project_root, "Config", "symbols.txt"))
 
 
 for symbol in symbols:
@@ -91,7 +65,9 @@ for symbol in symbols:
     try:
         logger.info(f"Running subprocess")
         result = subprocess.run(
-            ["python", LOAD_PSQL_PATH, symbol],
+            # Run the unified CLI from the project root so package imports resolve
+            [sys.executable, "-m", "ETL", "backfill", symbol],
+            cwd=project_root,
             capture_output=True,
             text=True,
             check=False,  # We check the returncode manually to log appropriately
@@ -111,7 +87,7 @@ for symbol in symbols:
             )
 
     except FileNotFoundError:
-        logger.exception(f"Error: The script at {LOAD_PSQL_PATH} was not found.")
+        logger.exception(f"Error: Python interpreter {sys.executable} was not found.")
     except Exception as e:
         logger.exception(
             f"An unexpected error occurred during subprocess execution. {e}"
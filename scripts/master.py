@@ -54,14 +54,13 @@ if not logger.handlers:
 # --- Main script ---
 logger.info("ETL master script started.")
 
-# Paths
-LOAD_PSQL_PATH = os.path.join(project_root, "ETL", "Load_psql.py")
-
-# Run Load_psql.py and log its output
+# Run the incremental load and log its output
 try:
     logger.info(f"Running subprocess")
     result = subprocess.run(
-        ["python", LOAD_PSQL_PATH, "IBM"],
+        # Run the unified CLI from the project root so package imports resolve
+        [sys.executable, "-m", "ETL", "incremental", "IBM"],
+        cwd=project_root,
         capture_output=True,
         text=True,
         check=False,  # We check the returncode manually to log appropriately
@@ -79,7 +78,7 @@ try:
         logger.error(f"Subprocess exited with a non-zero status: {result.returncode}")
 
 except FileNotFoundError:
-    logger.exception(f"Error: The script at {LOAD_PSQL_PATH} was not found.")
+    logger.exception(f"Error: Python interpreter {sys.executable} was not found.")
 except Exception as e:
     logger.exception(f"An unexpected error occurred during subprocess execution. {e}")
 
@@ -1,3 +1,4 @@
+import json
 import unittest
 from unittest.mock import patch, Mock
 from ETL.api_pipeline import fetch_data
@@ -5,7 +6,7 @@ from ETL.api_pipeline import fetch_data
 
 class TestApiPipeline(unittest.TestCase):
     @patch("ETL.api_pipeline.fetch_cdc")
-    @patch("ETL.api_pipeline.requests.get")
+    @patch("requests.get")
     def test_fetch_data_success(self, mock_get, mock_fetch_cdc):
         # Mock the return value of fetch_cdc
         mock_fetch_cdc.return_value = "2025-11-06 23:59:59"
@@ -13,7 +14,7 @@ class TestApiPipeline(unittest.TestCase):
         # Mock the API response
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.json.return_value = {
+        payload = {
             "Time Series (30min)": {
                 "2025-11-07 00:30:00": {
                     "1. open": "150.0000",
@@ -24,6 +25,7 @@ class TestApiPipeline(unittest.TestCase):
                 }
             }
         }
+        mock_response.iter_content.return_value = [json.dumps(payload).encode()]
         mock_get.return_value = mock_response
 
         # Call the function
@@ -34,6 +36,22 @@ class TestApiPipeline(unittest.TestCase):
         self.assertEqual(data[0][0], "2025-11-07 00:30:00")
         self.assertEqual(new_cdc, "2025-11-07 00:30:00")
 
+    @patch("requests.get")
+    def test_failed_stream_is_closed(self, mock_get):
+        import requests
+        from ETL.backFill_api_pipeline import _open_stream
+
+        mock_response = Mock()
+        mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(
+            "500 Server Error", response=mock_response
+        )
+        mock_get.return_value = mock_response
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            _open_stream("http://example.invalid/query", "2025-11")
+        # Otherwise the pooled connection stays checked out by the kept exception
+        mock_response.close.assert_called_once()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,148 @@
+import os
+import json
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import patch, Mock
+from ETL.cdc_outbox import (
+    CONSUMERS_TABLE,
+    NOTIFY_CHANNEL,
+    OUTBOX_TABLE,
+    append_to_log,
+    commit_offset,
+    prune_changes,
+    publish_changes,
+    read_changes,
+    read_log,
+)
+
+# Integration tests against a real server run only when this is set
+TEST_POSTGRES_DSN = os.getenv("TEST_POSTGRES_DSN")
+
+
+ROWS = [
+    (
+        datetime(2025, 11, 7, 0, 30, tzinfo=timezone.utc),
+        "IBM",
+        Decimal("150.0000"),
+        Decimal("151.0000"),
+        Decimal("149.0000"),
+        Decimal("150.5000"),
+        100000,
+    ),
+    (
+        datetime(2025, 11, 7, 1, 0, tzinfo=timezone.utc),
+        "IBM",
+        Decimal("150.5000"),
+        Decimal("152.0000"),
+        Decimal("150.0000"),
+        Decimal("151.5000"),
+        120000,
+    ),
+]
+
+
+class TestCdcOutbox(unittest.TestCase):
+    @patch("psycopg2.extras.execute_values")
+    def test_publish_changes_notifies_with_outbox_ids(self, mock_execute_values):
+        mock_execute_values.return_value = [(41,), (42,)]
+        cur = Mock()
+
+        change_ids = publish_changes(cur, "IBM", ROWS, sinks=["notify"])
+
+        self.assertEqual(change_ids, [41, 42])
+        channel, payload = cur.execute.call_args[0][1]
+        self.assertEqual(channel, NOTIFY_CHANNEL)
+        self.assertEqual(
+            json.loads(payload),
+            {"symbol": "IBM", "first_change_id": 41, "last_change_id": 42, "count": 2},
+        )
+
+    @patch("psycopg2.extras.execute_values")
+    def test_publish_changes_skips_empty(self, mock_execute_values):
+        self.assertEqual(publish_changes(Mock(), "IBM", []), [])
+        mock_execute_values.assert_not_called()
+
+    def test_file_log_can_be_tailed_with_offsets(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "changes.jsonl")
+
+            append_to_log(path, ROWS[:1], change_ids=[1])
+            records, offset = read_log(path)
+            self.assertEqual(len(records), 1)
+            self.assertEqual(records[0]["change_id"], 1)
+            self.assertEqual(records[0]["close"], 150.5)
+
+            # Concurrent writers leave gaps; each record keeps its own id
+            append_to_log(path, ROWS, change_ids=[5, 3])
+            records, offset = read_log(path, offset)
+            self.assertEqual([r["change_id"] for r in records], [5, 3])
+            self.assertEqual(read_log(path, offset), ([], offset))
+
+    def test_read_changes_only_returns_rows_older_than_the_snapshot_horizon(self):
+        cur = Mock()
+        cur.fetchall.return_value = [(42,) + ROWS[0]]
+
+        self.assertEqual(read_changes(cur, after_change_id=41, limit=10), [(42,) + ROWS[0]])
+
+        query, params = cur.execute.call_args[0]
+        self.assertEqual(params, (41, 10))
+        # xid8 horizon (PG13+) folded into the 32-bit xid space of row xmins
+        self.assertIn("pg_snapshot_xmin(pg_current_snapshot())", query)
+        self.assertIn("% 4294967296", query)
+        self.assertIn(f"age({OUTBOX_TABLE}.xmin) > age(horizon.oldest_xid)", query)
+        self.assertIn("ORDER BY change_id", query)
+
+    def test_prune_only_deletes_below_the_lowest_consumer_offset(self):
+        cur = Mock(rowcount=7)
+
+        commit_offset(cur, "dashboard", 120)
+        query, params = cur.execute.call_args[0]
+        self.assertEqual(params, ("dashboard", 120))
+        self.assertIn("GREATEST", query)
+
+        self.assertEqual(prune_changes(cur), 7)
+        query = cur.execute.call_args[0][0]
+        self.assertIn(f"change_id <= (SELECT min(change_id) FROM {CONSUMERS_TABLE})", query)
+
+
+@unittest.skipUnless(TEST_POSTGRES_DSN, "set TEST_POSTGRES_DSN to run against PostgreSQL 13+")
+class TestCdcOutboxPostgres(unittest.TestCase):
+    def setUp(self):
+        import psycopg2
+        from ETL.cdc_outbox import ensure_outbox
+
+        self.conns = [psycopg2.connect(TEST_POSTGRES_DSN) for _ in range(3)]
+        self.addCleanup(lambda: [conn.close() for conn in self.conns])
+        self.reader = self.conns[2]
+        self.reader.autocommit = True
+        with self.reader.cursor() as cur:
+            ensure_outbox(cur)
+            cur.execute(f"SELECT coalesce(max(change_id), 0) FROM {OUTBOX_TABLE};")
+            self.offset = cur.fetchone()[0]
+        self.addCleanup(self._delete_published)
+
+    def _delete_published(self):
+        with self.reader.cursor() as cur:
+            cur.execute(f"DELETE FROM {OUTBOX_TABLE} WHERE change_id > %s;", (self.offset,))
+
+    def test_a_late_commit_holds_back_newer_changes(self):
+        early, late = self.conns[0], self.conns[1]
+        with early.cursor() as cur:
+            [early_id] = publish_changes(cur, "IBM", ROWS[:1])
+        # Takes a higher id but commits first
+        with late.cursor() as cur:
+            [late_id] = publish_changes(cur, "IBM", ROWS[1:])
+        late.commit()
+
+        with self.reader.cursor() as cur:
+            self.assertEqual(read_changes(cur, self.offset), [])
+            early.commit()
+            self.assertEqual(
+                [row[0] for row in read_changes(cur, self.offset)], [early_id, late_id]
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
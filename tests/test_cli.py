@@ -0,0 +1,103 @@
+import os
+import glob
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from ETL.cli import main, read_symbols, run_per_symbol
+from ETL.gap_scan import find_gaps
+from ETL.sinks import SqliteSink
+from utils.profiling import profiled
+from utils.settings import get_settings
+
+
+ROWS = [
+    ("2025-11-07 09:30:00", "IBM", 150.0, 151.0, 149.0, 150.5, 100000.0),
+    ("2025-11-07 10:00:00", "IBM", 150.5, 152.0, 150.0, 151.5, 120000.0),
+    ("2025-11-07 11:30:00", "IBM", 151.5, 152.5, 151.0, 152.0, 90000.0),
+]
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_read_symbols_skips_comments_and_duplicates(self):
+        path = os.path.join(self.tmp.name, "symbols.txt")
+        with open(path, "w") as f:
+            f.write("# universe\nIBM\n\nV  # visa\nIBM\n")
+        self.assertEqual(read_symbols(path), ["IBM", "V"])
+
+    def test_find_gaps_ignores_overnight(self):
+        timestamps = [datetime.strptime(r[0], "%Y-%m-%d %H:%M:%S") for r in ROWS]
+        timestamps.append(datetime(2025, 11, 10, 9, 30))
+        gaps = list(find_gaps(timestamps))
+        self.assertEqual(len(gaps), 1)
+        self.assertEqual(gaps[0][2], 2)
+
+    @patch("ETL.Load_psql.update_cdc")
+    @patch("ETL.sinks.get_sink")
+    @patch("ETL.api_pipeline.fetch_batches")
+    @patch("utils.fetch_last_cdc.fetch_cdc")
+    def test_incremental_dry_run_writes_nothing(
+        self, mock_fetch_cdc, mock_fetch_batches, mock_get_sink, mock_update_cdc
+    ):
+        mock_fetch_cdc.return_value = "2025-11-06 23:59:59"
+        mock_fetch_batches.return_value = iter([ROWS[:2], ROWS[2:]])
+        profile_dir = os.path.join(self.tmp.name, "profile")
+
+        exit_code = main(["incremental", "IBM", "--dry-run", "--profile", profile_dir])
+
+        self.assertEqual(exit_code, 0)
+        mock_get_sink.assert_not_called()
+        mock_update_cdc.assert_not_called()
+        self.assertEqual(len(glob.glob(os.path.join(profile_dir, "incremental_*.pstats"))), 1)
+
+    def test_profile_includes_worker_threads(self):
+        import pstats
+
+        def work_in_worker(symbol):
+            return sum(range(10000))
+
+        profile_dir = os.path.join(self.tmp.name, "profile")
+        with profiled(profile_dir, "workers"):
+            run_per_symbol(["IBM", "V"], work_in_worker, concurrency=2)
+
+        (path,) = glob.glob(os.path.join(profile_dir, "workers_*.pstats"))
+        functions = {name for _, _, name in pstats.Stats(path).stats}
+        self.assertIn("work_in_worker", functions)
+
+    @patch("ETL.Load_psql.update_cdc")
+    @patch("ETL.sinks.get_sink")
+    @patch("ETL.api_pipeline.fetch_batches")
+    @patch("utils.fetch_last_cdc.fetch_cdc")
+    def test_incremental_failure_sets_exit_code_and_keeps_cdc(
+        self, mock_fetch_cdc, mock_fetch_batches, mock_get_sink, mock_update_cdc
+    ):
+        mock_fetch_cdc.return_value = "2025-11-06 23:59:59"
+        mock_fetch_batches.return_value = iter([ROWS])
+        mock_get_sink.return_value.write.side_effect = RuntimeError("database is down")
+
+        self.assertEqual(main(["incremental", "IBM"]), 1)
+        mock_update_cdc.assert_not_called()
+
+    @patch("ETL.Load_psql.bump_version")
+    @patch("ETL.backFill_api_pipeline.backfill_data")
+    def test_backfill_to_sqlite_then_gap_scan(self, mock_backfill_data, mock_bump_version):
+        mock_backfill_data.return_value = iter([ROWS, ROWS[:1]])
+        db_path = os.path.join(self.tmp.name, "stocks.db")
+
+        with patch.dict(os.environ, {"SQLITE_PATH": db_path}):
+            get_settings.cache_clear()
+            self.addCleanup(get_settings.cache_clear)
+            self.assertEqual(main(["backfill", "IBM", "--sink", "sqlite"]), 0)
+            self.assertEqual(main(["gap-scan", "IBM", "--sink", "sqlite"]), 0)
+
+        self.assertEqual(len(list(SqliteSink(db_path).timestamps("IBM"))), 3)
+        # Only the first chunk inserted anything
+        self.assertEqual(mock_bump_version.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
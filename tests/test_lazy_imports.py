@@ -0,0 +1,14 @@
+import unittest
+from utils.bench_imports import ENTRY_MODULES, measure_import
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_entry_modules_do_not_import_heavy_dependencies(self):
+        for module in ENTRY_MODULES:
+            with self.subTest(module=module):
+                result = measure_import(module, repeat=1)
+                self.assertEqual(result["heavy_imports"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
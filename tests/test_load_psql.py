@@ -0,0 +1,44 @@
+import os
+import json
+import tempfile
+import unittest
+from ETL.Load_psql import bump_version, update_cdc
+
+
+class TestCdcFile(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.path = os.path.join(tmp.name, "last_cdc.json")
+
+    def test_updates_keep_other_symbols_and_leave_no_temp_files(self):
+        update_cdc("IBM", "2025-11-07 10:00:00", path=self.path)
+        update_cdc("V", "2025-11-07 10:30:00", path=self.path)
+        bump_version("IBM", path=self.path)
+
+        with open(self.path) as f:
+            self.assertEqual(
+                json.load(f),
+                {
+                    "IBM_cdc": "2025-11-07 10:00:00",
+                    "V_cdc": "2025-11-07 10:30:00",
+                    "IBM_version": 1,
+                },
+            )
+        self.assertFalse([name for name in os.listdir(self.dir) if name.endswith(".tmp")])
+
+    def test_unreadable_file_is_not_overwritten(self):
+        with open(self.path, "w") as f:
+            f.write('{"IBM_cdc": "2025-11-07 10:00:00", "V_cd')
+
+        with self.assertLogs("ETL.Load_psql", "ERROR"):
+            update_cdc("IBM", "2025-11-07 11:00:00", path=self.path)
+            bump_version("IBM", path=self.path)
+
+        with open(self.path) as f:
+            self.assertEqual(f.read(), '{"IBM_cdc": "2025-11-07 10:00:00", "V_cd')
+
+
+if __name__ == "__main__":
+    unittest.main()
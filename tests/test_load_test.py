@@ -0,0 +1,30 @@
+import unittest
+from datetime import datetime
+from utils.fake_alphavantage import BARS_PER_DAY, month_bars
+from utils.load_test import run
+
+
+class TestLoadTest(unittest.TestCase):
+    def test_fake_series_is_deterministic_and_skips_weekends(self):
+        bars = month_bars("IBM", "2025-11")
+        self.assertEqual(bars, month_bars("IBM", "2025-11"))
+        # November 2025 has 20 weekdays
+        self.assertEqual(len(bars), 20 * BARS_PER_DAY)
+        self.assertTrue(
+            all(datetime.strptime(b[0], "%Y-%m-%d %H:%M:%S").weekday() < 5 for b in bars)
+        )
+        until = datetime(2025, 11, 3, 9, 45)
+        self.assertEqual(month_bars("IBM", "2025-11", until=until)[-1][0], "2025-11-03 09:30:00")
+
+    def test_end_to_end_ingestion_with_rate_limit_notes(self):
+        report = run(["IBM", "V"], years=1, concurrency=2, note_rate=0.3, seed=1)
+
+        self.assertTrue(report["ok"], report["failures"])
+        for result in report["symbols"].values():
+            self.assertEqual(result["rows"], result["expected"])
+        rerun = dict((name, rows) for name, _, rows, _ in report["phases"])["rerun"]
+        self.assertEqual(rerun, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
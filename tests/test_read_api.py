@@ -0,0 +1,114 @@
+import os
+import json
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from urllib.error import HTTPError
+from urllib.request import urlopen
+from ETL.Load_psql import bump_version, update_cdc
+from ETL.read_api import StocksReader, make_server
+from ETL.sinks import SqliteSink
+
+
+ROWS = [
+    ("2025-11-06 15:30:00", "IBM", 149.0, 150.0, 148.0, 149.5, 80000.0),
+    ("2025-11-07 09:30:00", "IBM", 150.0, 151.0, 149.0, 150.5, 100000.0),
+    ("2025-11-07 10:00:00", "IBM", 150.5, 152.0, 150.0, 151.5, 120000.0),
+    ("2025-11-07 10:00:00", "V", 330.0, 331.0, 329.0, 330.5, 50000.0),
+]
+
+
+class TestReadApi(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db_path = os.path.join(tmp.name, "stocks.db")
+        self.cdc_path = os.path.join(tmp.name, "last_cdc.json")
+        self.sink = SqliteSink(self.db_path)
+        self.sink.write("IBM", ROWS[:3])
+        self.sink.write("V", ROWS[3:])
+        update_cdc("IBM", "2025-11-07 10:00:00", path=self.cdc_path)
+        update_cdc("V", "2025-11-07 10:00:00", path=self.cdc_path)
+
+        self.reader = StocksReader(sink="sqlite", cdc_path=self.cdc_path, sqlite_path=self.db_path)
+        self.addCleanup(self.reader.close)
+
+    def test_last_bars_and_day_range_are_columnar(self):
+        last = self.reader.last_bars("IBM", 2)
+        self.assertEqual(
+            last["columns"]["trade_timestamp_utc"], ["2025-11-07 09:30:00", "2025-11-07 10:00:00"]
+        )
+        self.assertEqual(last["columns"]["volume"], [100000, 120000])
+
+        day = self.reader.day_range("IBM", "2025-11-06", "2025-11-06")
+        self.assertEqual(day["columns"]["close"], [149.5])
+
+    def test_cache_is_invalidated_only_when_symbol_watermark_advances(self):
+        self.reader.last_bars("IBM", 10)
+        self.reader.last_bars("V", 10)
+        self.reader.last_bars("IBM", 10)
+        self.assertEqual(self.reader.cache.stats()["hits"], 1)
+
+        self.sink.write("IBM", [("2025-11-07 10:30:00", "IBM", 151.5, 153.0, 151.0, 152.0, 90000.0)])
+        # Written but watermark not advanced yet: still served from cache
+        self.assertEqual(len(self.reader.last_bars("IBM", 10)["columns"]["open"]), 3)
+
+        update_cdc("IBM", "2025-11-07 10:30:00", path=self.cdc_path)
+        self.assertEqual(len(self.reader.last_bars("IBM", 10)["columns"]["open"]), 4)
+        self.reader.last_bars("V", 10)
+
+        stats = self.reader.cache.stats()
+        self.assertEqual(stats["invalidations"], 1)
+        self.assertEqual(stats["hits"], 3)
+
+    def test_backfilled_rows_invalidate_cached_ranges(self):
+        self.assertEqual(self.reader.day_range("IBM", "2025-11-05", "2025-11-05")["columns"]["open"], [])
+
+        # Backfill writes older rows without touching the watermark
+        self.sink.write("IBM", [("2025-11-05 10:00:00", "IBM", 148.0, 149.0, 147.5, 148.5, 70000.0)])
+        bump_version("IBM", path=self.cdc_path)
+
+        self.assertEqual(self.reader.day_range("IBM", "2025-11-05", "2025-11-05")["columns"]["open"], [148.0])
+        self.assertEqual(self.reader.cache.stats()["invalidations"], 1)
+
+    def test_http_endpoint(self):
+        server = make_server(self.reader, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        base = f"http://127.0.0.1:{server.server_port}"
+
+        with urlopen(f"{base}/bars?symbol=IBM&start=2025-11-07") as r:
+            body = json.load(r)
+        self.assertEqual(body["columns"]["open"], [150.0, 150.5])
+
+        with urlopen(f"{base}/stats") as r:
+            self.assertEqual(json.load(r)["misses"], 1)
+
+        with patch.object(self.reader, "_query", side_effect=sqlite3.OperationalError("database is locked")):
+            with self.assertRaises(HTTPError) as raised:
+                urlopen(f"{base}/bars?symbol=V&last=5")
+        self.assertEqual(raised.exception.code, 503)
+        self.assertIn("database is locked", json.load(raised.exception)["error"])
+        raised.exception.close()
+
+        with patch.object(self.reader, "_query", side_effect=sqlite3.OperationalError("no such table: stocks_data")):
+            with self.assertRaises(HTTPError) as raised:
+                urlopen(f"{base}/bars?symbol=V&last=5")
+        self.assertEqual(raised.exception.code, 500)
+        raised.exception.close()
+
+    def test_only_connection_errors_count_as_unavailable(self):
+        import psycopg2
+        from ETL.read_api import _is_unavailable
+
+        self.assertTrue(_is_unavailable(psycopg2.OperationalError("server closed the connection")))
+        self.assertTrue(_is_unavailable(psycopg2.InterfaceError("connection already closed")))
+        self.assertFalse(_is_unavailable(psycopg2.ProgrammingError("relation does not exist")))
+        self.assertFalse(_is_unavailable(sqlite3.OperationalError("near \"SELEC\": syntax error")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from datetime import date
+from unittest.mock import MagicMock, patch
+from ETL import retention
+
+
+class TestRetention(unittest.TestCase):
+    def test_cutoff_is_aligned_to_month_start(self):
+        self.assertEqual(
+            retention.retention_cutoff(365, today=date(2026, 3, 15)), date(2025, 3, 1)
+        )
+
+    def test_month_ranges_stop_before_cutoff(self):
+        self.assertEqual(
+            list(retention.month_ranges(date(2024, 11, 20), date(2025, 2, 1))),
+            [
+                (date(2024, 11, 1), date(2024, 12, 1)),
+                (date(2024, 12, 1), date(2025, 1, 1)),
+                (date(2025, 1, 1), date(2025, 2, 1)),
+            ],
+        )
+        self.assertEqual(list(retention.month_ranges(date(2025, 2, 3), date(2025, 2, 1))), [])
+
+    def test_move_month_creates_partition_before_moving_then_rolls_up(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value.__enter__.return_value
+        cur.rowcount = 42
+
+        moved = retention.move_month(conn, "IBM", date(2024, 12, 1), date(2025, 1, 1))
+
+        self.assertEqual(moved, 42)
+        statements = [call.args[0] for call in cur.execute.call_args_list]
+        self.assertIn("INSERT INTO symbols", statements[0])
+        self.assertIn("stocks_data_cold_2024", statements[1])
+        self.assertIs(statements[2], retention.MOVE_MONTH)
+        self.assertIs(statements[3], retention.ROLLUP_MONTH)
+        self.assertEqual(
+            cur.execute.call_args_list[2].args[1],
+            {"symbol": "IBM", "start": "2024-12-01", "end": "2025-01-01"},
+        )
+
+    def test_run_skips_a_month_whose_prices_overflow(self):
+        from psycopg2 import errors
+
+        conn = MagicMock()
+        cur = conn.cursor.return_value.__enter__.return_value
+        # relation sizes, hot symbols, relation sizes
+        cur.fetchall.side_effect = [[], [("BRK.A",), ("IBM",)], []]
+        cur.fetchone.return_value = (date(2024, 11, 5),)
+
+        def move(conn, symbol, start, end):
+            if symbol == "BRK.A" and start == date(2024, 11, 1):
+                raise errors.NumericValueOutOfRange("integer out of range")
+            return 10
+
+        with patch("psycopg2.connect", return_value=conn), \
+                patch.object(retention, "move_month", side_effect=move):
+            with self.assertLogs("ETL.retention", "WARNING") as logs:
+                moved = retention.run(365, today=date(2026, 1, 15))
+
+        # Nov + Dec 2024 for IBM, Dec 2024 only for BRK.A
+        self.assertEqual(moved, 30)
+        self.assertIn("BRK.A 2024-11", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
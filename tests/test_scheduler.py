@@ -0,0 +1,166 @@
+import os
+import json
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch, Mock
+from ETL import scheduler
+from ETL.stream_parser import ApiError
+
+NOW = datetime(2026, 3, 15, 12, 0)
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.state = scheduler.SchedulerState(os.path.join(tmp.name, "state.json"))
+        self.cdc_path = os.path.join(tmp.name, "last_cdc.json")
+
+    def test_months_to_fetch(self):
+        self.assertEqual(
+            scheduler.months_to_fetch(datetime(2025, 12, 31, 23, 59, 59), NOW),
+            ["2026-01", "2026-02", "2026-03"],
+        )
+        self.assertEqual(
+            scheduler.months_to_fetch(datetime(2026, 3, 14, 19, 30), NOW), ["2026-03"]
+        )
+
+    def test_plan_levels_most_behind_first(self):
+        watermarks = {
+            "FRESH": datetime(2026, 3, 14, 19, 30),
+            "OLD": datetime(2025, 11, 30, 23, 59, 59),
+            "OLDER": datetime(2025, 9, 30, 23, 59, 59),
+        }
+        calls = scheduler.plan(list(watermarks), watermarks, self.state, 5, now=NOW)
+        self.assertEqual(
+            calls,
+            [
+                ("OLDER", "2025-10"),
+                ("OLDER", "2025-11"),
+                ("OLD", "2025-12"),
+                ("OLDER", "2025-12"),
+                ("OLD", "2026-01"),
+            ],
+        )
+
+    def test_failing_symbols_are_deprioritised(self):
+        watermarks = {
+            "FLAKY": datetime(2025, 10, 31, 23, 59, 59),
+            "OK": datetime(2025, 12, 31, 23, 59, 59),
+        }
+        for _ in range(5):
+            self.state.record("FLAKY", ok=False)
+        self.assertEqual(
+            scheduler.plan(list(watermarks), watermarks, self.state, 1, now=NOW),
+            [("OK", "2026-01")],
+        )
+
+    def test_projection(self):
+        watermarks = {"A": datetime(2025, 12, 31, 23, 59, 59), "B": None}
+        projection = scheduler.project(
+            list(watermarks), watermarks, self.state, 10, now=NOW, start_month="2025-01"
+        )
+        self.assertEqual(projection["remaining_calls"], 3 + 15)
+        self.assertEqual(projection["days"], 2)
+        self.assertEqual(projection["eta"], datetime(2026, 3, 17, 12, 0))
+
+    @patch("ETL.backFill_api_pipeline.fetch_batches")
+    @patch("ETL.scheduler.get_settings")
+    def test_run_advances_watermarks_and_blocks_failed_symbols(self, mock_settings, mock_fetch):
+        mock_settings.return_value = Mock(cdc_path=self.cdc_path)
+        with open(self.cdc_path, "w") as f:
+            json.dump(
+                {"A_cdc": "2025-11-30 23:59:59", "B_cdc": "2025-12-31 23:59:59"}, f
+            )
+
+        def fetch(symbol, month, raise_api_errors=False):
+            if symbol == "A" and month == "2026-01":
+                raise ApiError("Invalid API call.", kind="Error Message")
+            if symbol == "A":
+                yield [(f"{month}-10 10:00:00", symbol, 1.0, 1.0, 1.0, 1.0, 1.0)]
+
+        mock_fetch.side_effect = fetch
+        sink = Mock()
+        sink.write.return_value = 1
+
+        succeeded, failed = scheduler.run(
+            ["A", "B"], 4, sink=sink, delay=0, state_path=self.state.path, now=NOW
+        )
+
+        self.assertEqual((succeeded, failed), (3, 1))
+        with open(self.cdc_path) as f:
+            cdc = json.load(f)
+        # A got December, then failed on January and was not retried past the gap
+        self.assertEqual(cdc["A_cdc"], "2025-12-31 23:59:59")
+        # B: January and February are empty but complete; March is the current month
+        self.assertEqual(cdc["B_cdc"], "2026-02-28 23:59:59")
+        state = scheduler.SchedulerState(self.state.path)
+        self.assertEqual(state.symbols["A"]["failures"], 1)
+        self.assertEqual(sink.write.call_count, 1)
+
+    @patch("ETL.backFill_api_pipeline.fetch_batches")
+    @patch("ETL.scheduler.get_settings")
+    def test_incremental_run_between_catch_ups_does_not_hide_missing_months(self, mock_settings, mock_fetch):
+        from ETL.Load_psql import update_cdc
+
+        mock_settings.return_value = Mock(cdc_path=self.cdc_path)
+        with open(self.cdc_path, "w") as f:
+            json.dump({"A_cdc": "2025-11-30 23:59:59"}, f)
+        fetched = []
+
+        def fetch(symbol, month, raise_api_errors=False):
+            fetched.append(month)
+            yield [(f"{month}-10 10:00:00", symbol, 1.0, 1.0, 1.0, 1.0, 1.0)]
+
+        mock_fetch.side_effect = fetch
+
+        sink = Mock()
+        sink.write.return_value = 1
+        scheduler.run(["A"], 1, sink=sink, delay=0, state_path=self.state.path, now=NOW)
+        self.assertEqual(fetched, ["2025-12"])
+
+        # The daily incremental load moves the watermark to the newest bar
+        update_cdc("A", "2026-03-15 11:30:00", path=self.cdc_path)
+
+        state = scheduler.SchedulerState(self.state.path)
+        positions = scheduler.catch_up_positions(
+            ["A"], scheduler.load_watermarks(["A"], self.cdc_path), state
+        )
+        self.assertEqual(scheduler.project(["A"], positions, state, 10, now=NOW)["remaining_calls"], 3)
+
+        scheduler.run(["A"], 5, sink=sink, delay=0, state_path=self.state.path, now=NOW)
+
+        self.assertEqual(fetched, ["2025-12", "2026-01", "2026-02", "2026-03"])
+        self.assertEqual(scheduler.SchedulerState(self.state.path).complete_through("A"), "2026-02")
+        # Filling the gap does not move the watermark backwards; each month
+        # that inserted rows below it bumps the data version instead
+        with open(self.cdc_path) as f:
+            cdc = json.load(f)
+        self.assertEqual(cdc["A_cdc"], "2026-03-15 11:30:00")
+        self.assertEqual(cdc["A_version"], 3)
+
+    @patch("ETL.backFill_api_pipeline.fetch_batches")
+    @patch("ETL.scheduler.get_settings")
+    def test_rate_limit_stops_the_run_without_penalising_the_symbol(self, mock_settings, mock_fetch):
+        mock_settings.return_value = Mock(cdc_path=self.cdc_path)
+        with open(self.cdc_path, "w") as f:
+            json.dump({"A_cdc": "2025-11-30 23:59:59", "B_cdc": "2025-12-31 23:59:59"}, f)
+
+        def fetch(symbol, month, raise_api_errors=False):
+            raise ApiError("Thank you for using Alpha Vantage! rate limit", kind="Note")
+            yield
+
+        mock_fetch.side_effect = fetch
+
+        succeeded, failed = scheduler.run(
+            ["A", "B"], 4, sink=Mock(), delay=0, state_path=self.state.path, now=NOW
+        )
+
+        self.assertEqual((succeeded, failed), (0, 1))
+        self.assertEqual(mock_fetch.call_count, 1)
+        self.assertEqual(scheduler.SchedulerState(self.state.path).failure_rate("A"), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
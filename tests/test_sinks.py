@@ -0,0 +1,79 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from ETL.sinks import PostgresSink
+
+ROW = ("2024-11-07 00:30:00", "IBM", 150.0, 151.0, 149.0, 150.5, 100000)
+
+
+class TestPostgresSink(unittest.TestCase):
+    def setUp(self):
+        self.sink = PostgresSink(db_config={}, feed_sinks=["file"])
+        self.conn = MagicMock()
+        self.cur = self.conn.cursor.return_value.__enter__.return_value
+        patcher = patch.object(PostgresSink, "_connect", return_value=self.conn)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ensure_schema_creates_table_with_constraint_before_altering(self):
+        # Fresh database: the constraint exists because CREATE TABLE declared it
+        self.cur.fetchone.return_value = (1,)
+
+        self.sink.ensure_schema()
+
+        statements = [call.args[0] for call in self.cur.execute.call_args_list]
+        self.assertIn("CREATE TABLE IF NOT EXISTS stocks_data(", statements[0])
+        self.assertIn("UNIQUE (symbol, trade_timestamp_utc)", statements[0])
+        self.assertIn("DROP CONSTRAINT IF EXISTS trade_timestamp_utc_unique", statements[1])
+        self.assertFalse(any("ADD CONSTRAINT" in s for s in statements))
+        self.assertTrue(any("stocks_data_all" in s for s in statements))
+        self.assertTrue(self.sink._schema_ready)
+        self.conn.close.assert_called_once()
+
+    def test_ensure_schema_adds_constraint_to_legacy_table(self):
+        # Table created by an older version, without the composite constraint
+        self.cur.fetchone.return_value = None
+
+        self.sink.ensure_schema()
+
+        statements = [call.args[0] for call in self.cur.execute.call_args_list]
+        self.assertIn("ADD CONSTRAINT symbol_trade_timestamp_utc_unique", statements[3])
+
+    def test_ensure_schema_runs_once_across_threads(self):
+        import threading
+        import time
+
+        calls = []
+
+        def create_schema():
+            calls.append(1)
+            time.sleep(0.05)  # Long enough for every thread to arrive meanwhile
+
+        with patch.object(self.sink, "_create_schema", side_effect=create_schema):
+            threads = [threading.Thread(target=self.sink.ensure_schema) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(self.sink._schema_ready)
+
+    @patch("ETL.cdc_outbox.append_to_log")
+    @patch("psycopg2.extras.execute_values")
+    def test_write_skips_rows_already_in_the_cold_tier(self, mock_execute_values, mock_append):
+        self.sink._schema_ready = True
+        # Every row is already archived: nothing inserted, so nothing published
+        mock_execute_values.return_value = []
+
+        inserted = self.sink.write("IBM", [ROW])
+
+        self.assertEqual(inserted, 0)
+        query = mock_execute_values.call_args[0][1]
+        self.assertIn("NOT EXISTS", query)
+        self.assertIn("stocks_data_cold", query)
+        self.conn.commit.assert_called_once()
+        mock_append.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import json
+import unittest
+import tracemalloc
+from datetime import datetime
+from ETL.stream_parser import ApiError, batched, iter_rows, iter_time_series
+
+KEY = "Time Series (30min)"
+
+
+def make_payload(n):
+    return {
+        "Meta Data": {"1. Information": "Intraday (30min)", "2. Symbol": "IBM"},
+        KEY: {
+            f"2025-11-07 {h:02d}:{m:02d}:00": {
+                "1. open": "150.0000",
+                "2. high": "151.0000",
+                "3. low": "149.0000",
+                "4. close": "150.5000",
+                "5. volume": str(1000 + h * 60 + m),
+            }
+            for h in range(23, 23 - n // 2, -1)
+            for m in (30, 0)
+        },
+    }
+
+
+def split(body, size):
+    return [body[i : i + size] for i in range(0, len(body), size)]
+
+
+def synthetic_chunks(entries):
+    """Produces a large response body lazily, so the test itself stays small in memory."""
+    yield b'{"Meta Data": {"2. Symbol": "IBM"}, "Time Series (30min)": {'
+    for i in range(entries):
+        sep = b"," if i else b""
+        yield sep + (
+            f'"2000-01-01 00:00:{i:08d}": {{"1. open": "1.0", "2. high": "2.0", '
+            f'"3. low": "0.5", "4. close": "1.5", "5. volume": "{i}"}}'
+        ).encode()
+    yield b"}}"
+
+
+class TestStreamParser(unittest.TestCase):
+    def test_entries_match_json_loads_for_any_chunking(self):
+        payload = make_payload(10)
+        body = json.dumps(payload, indent=4).encode()
+        expected = list(payload[KEY].items())
+        for size in (1, 7, 64, len(body)):
+            with self.subTest(chunk_size=size):
+                self.assertEqual(list(iter_time_series(split(body, size), KEY)), expected)
+
+    def test_rows_are_filtered_and_converted(self):
+        body = json.dumps(make_payload(4)).encode()
+        rows = list(iter_rows([body], KEY, "IBM", since=datetime(2025, 11, 7, 22, 30)))
+        self.assertEqual(
+            rows,
+            [
+                ("2025-11-07 23:30:00", "IBM", 150.0, 151.0, 149.0, 150.5, 2410.0),
+                ("2025-11-07 23:00:00", "IBM", 150.0, 151.0, 149.0, 150.5, 2380.0),
+                ("2025-11-07 22:30:00", "IBM", 150.0, 151.0, 149.0, 150.5, 2350.0),
+            ],
+        )
+
+    def test_error_payload_raises_api_error(self):
+        with self.assertRaisesRegex(ApiError, "rate limit"):
+            list(iter_time_series([b'{"Note": "rate limit"}'], KEY))
+
+    def test_truncated_body_raises(self):
+        body = json.dumps(make_payload(10)).encode()
+        with self.assertRaises(ValueError):
+            list(iter_time_series([body[: len(body) // 2]], KEY))
+
+    def test_peak_memory_does_not_grow_with_payload(self):
+        def peak(entries):
+            tracemalloc.start()
+            try:
+                for batch in batched(iter_rows(synthetic_chunks(entries), KEY, "IBM"), 500):
+                    pass
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        small, large = peak(2_000), peak(20_000)
+        self.assertLess(large, small * 1.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
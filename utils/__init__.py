@@ -1,2 +1,11 @@
 from .fetch_last_cdc import fetch_cdc
-from .send_email import send_mail
+from .settings import get_settings
+
+
+def __getattr__(name):
+    # send_mail pulls in smtplib/ssl; only import it when someone asks for it
+    if name == "send_mail":
+        from .send_email import send_mail
+
+        return send_mail
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,82 @@
+import os
+import re
+import subprocess
+import sys
+import statistics
+
+# --- Constants ---
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Modules imported by the entry points; these are what cold start pays for
+ENTRY_MODULES = [
+    "utils",
+    "ETL.api_pipeline",
+    "ETL.backFill_api_pipeline",
+    "ETL.Load_psql",
+    "ETL.cli",
+]
+
+# Heavy third-party packages that must not be imported just by loading an entry module
+HEAVY_MODULES = ["psycopg2", "requests", "tenacity", "dotenv", "smtplib"]
+
+# Lines of `python -X importtime` look like: "import time:   self [us] | cumulative | name"
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_import(module: str, repeat: int = 5):
+    """
+    Imports a module in fresh interpreters and measures its cold import cost.
+
+    Args:
+        module (str): Dotted module name, e.g. 'ETL.api_pipeline'.
+        repeat (int): Number of fresh interpreters to spawn.
+
+    Returns:
+        A dict with the median cumulative import time (ms) of the module, and
+        the sorted list of heavy modules that got imported along with it.
+    """
+    timings = []
+    loaded = set()
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=project_root,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        cumulative_us = 0
+        for line in result.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if not match:
+                continue
+            name = match.group(4)
+            if name == module:
+                cumulative_us = int(match.group(2))
+            if name.split(".")[0] in HEAVY_MODULES:
+                loaded.add(name.split(".")[0])
+        timings.append(cumulative_us / 1000)
+
+    return {
+        "module": module,
+        "median_ms": statistics.median(timings),
+        "heavy_imports": sorted(loaded),
+    }
+
+
+def run(modules=None, repeat: int = 5):
+    """Measures all modules and returns the list of result dicts."""
+    return [measure_import(m, repeat=repeat) for m in modules or ENTRY_MODULES]
+
+
+def format_report(results):
+    lines = [f"{'module':<30} {'import ms':>10}  heavy imports"]
+    for r in results:
+        heavy = ", ".join(r["heavy_imports"]) or "-"
+        lines.append(f"{r['module']:<30} {r['median_ms']:>10.2f}  {heavy}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # Usage: python -m utils.bench_imports [module ...]
+    print(format_report(run(sys.argv[1:] or None)))
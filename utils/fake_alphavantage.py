@@ -0,0 +1,230 @@
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+# --- Constants ---
+FORMAT_CODE = "%Y-%m-%d %H:%M:%S"
+TIME_SERIES_KEY = "Time Series (30min)"
+# Extended hours, like the real API: 04:00 to 19:30, every 30 minutes
+FIRST_BAR = timedelta(hours=4)
+BARS_PER_DAY = 32
+WRITE_CHUNK = 64 * 1024
+RATE_LIMIT_NOTE = (
+    "Thank you for using Alpha Vantage! Our standard API call frequency is "
+    "5 calls per minute and 500 calls per day."
+)
+
+
+def month_bars(symbol, year_month, until=None):
+    """
+    Deterministic 30-minute bars of symbol for one month, oldest first:
+    [(timestamp, open, high, low, close, volume)]. Every weekday has
+    BARS_PER_DAY bars; bars after `until` (a datetime) are left out.
+    """
+    start = datetime.strptime(year_month, "%Y-%m")
+    # Same symbol and month -> same series, in every process and on every run
+    rng = random.Random(f"{symbol}:{year_month}")
+    price = random.Random(symbol).uniform(20, 500) * rng.uniform(0.8, 1.2)
+
+    bars = []
+    day = start
+    while day.month == start.month:
+        if day.weekday() < 5:
+            for i in range(BARS_PER_DAY):
+                ts = day + FIRST_BAR + timedelta(minutes=30 * i)
+                if until is not None and ts > until:
+                    return bars
+                open_ = price
+                close = max(open_ * (1 + rng.gauss(0, 0.004)), 1.0)
+                high = max(open_, close) * (1 + abs(rng.gauss(0, 0.002)))
+                low = min(open_, close) * (1 - abs(rng.gauss(0, 0.002)))
+                volume = rng.randint(1_000, 500_000)
+                bars.append(
+                    (ts.strftime(FORMAT_CODE), round(open_, 4), round(high, 4), round(low, 4), round(close, 4), volume)
+                )
+                price = close
+        day += timedelta(days=1)
+    return bars
+
+
+def render(symbol, year_month, until=None):
+    """The JSON body the real API returns for one month, newest bar first."""
+    series = {
+        ts: {
+            "1. open": f"{open_:.4f}",
+            "2. high": f"{high:.4f}",
+            "3. low": f"{low:.4f}",
+            "4. close": f"{close:.4f}",
+            "5. volume": str(volume),
+        }
+        for ts, open_, high, low, close, volume in reversed(month_bars(symbol, year_month, until))
+    }
+    payload = {
+        "Meta Data": {
+            "1. Information": "Intraday (30min) open, high, low, close prices and volume",
+            "2. Symbol": symbol,
+            "3. Last Refreshed": next(iter(series), ""),
+            "4. Interval": "30min",
+            "5. Output Size": "Full size",
+            "6. Time Zone": "US/Eastern",
+        },
+        TIME_SERIES_KEY: series,
+    }
+    return json.dumps(payload, indent=4).encode()
+
+
+def _fraction(seed, kind, symbol, year_month):
+    digest = hashlib.sha1(f"{seed}:{kind}:{symbol}:{year_month}".encode()).hexdigest()
+    return int(digest[:8], 16) / 2**32
+
+
+class FakeAlphaVantage:
+    """
+    State of the fake API: its clock, which (symbol, month) requests fail,
+    and request counters.
+
+    Failures are deterministic: a month picked by error_rate answers its first
+    request with HTTP 500, a month picked by note_rate answers its next one
+    with a rate-limit "Note". Every later request for that month succeeds.
+    """
+
+    def __init__(self, now=None, latency=0.0, note_rate=0.0, error_rate=0.0, seed=0):
+        self.now = now or datetime.now()
+        self.latency = latency
+        self.note_rate = note_rate
+        self.error_rate = error_rate
+        self.seed = seed
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "ok": 0, "notes": 0, "errors": 0, "bytes": 0}
+
+    def outcome(self, symbol, year_month):
+        """'error', 'note' or 'ok' for the next request of (symbol, year_month)."""
+        failures = []
+        if _fraction(self.seed, "error", symbol, year_month) < self.error_rate:
+            failures.append("error")
+        if _fraction(self.seed, "note", symbol, year_month) < self.note_rate:
+            failures.append("note")
+        with self._lock:
+            attempt = self._attempts.get((symbol, year_month), 0)
+            self._attempts[(symbol, year_month)] = attempt + 1
+        return failures[attempt] if attempt < len(failures) else "ok"
+
+    def count(self, name, nbytes=0):
+        with self._lock:
+            self.counters["requests"] += 1
+            self.counters[name] += 1
+            self.counters["bytes"] += nbytes
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, now=self.now.strftime(FORMAT_CODE))
+
+
+def make_server(api, host="127.0.0.1", port=0):
+    """
+    Threaded HTTP server over api:
+
+        GET  /query?function=TIME_SERIES_INTRADAY&symbol=IBM&interval=30min&month=2024-05&apikey=...
+        GET  /stats
+        POST /clock?now=YYYY-MM-DD HH:MM:SS     (moves the fake clock)
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import urlparse, parse_qs
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+            if url.path == "/stats":
+                return self._send(200, json.dumps(api.stats()).encode())
+            if url.path != "/query":
+                return self._send(404, b'{"Error Message": "Not found."}')
+
+            if api.latency:
+                time.sleep(api.latency)
+
+            symbol = params.get("symbol")
+            year_month = params.get("month") or api.now.strftime("%Y-%m")
+            if params.get("function") != "TIME_SERIES_INTRADAY" or params.get("interval") != "30min" or not symbol:
+                body = json.dumps({"Error Message": "Invalid API call."}).encode()
+                api.count("errors", len(body))
+                return self._send(200, body)
+
+            outcome = api.outcome(symbol, year_month)
+            if outcome == "error":
+                api.count("errors")
+                return self._send(500, b"Internal Server Error")
+            if outcome == "note":
+                body = json.dumps({"Note": RATE_LIMIT_NOTE}).encode()
+                api.count("notes", len(body))
+                return self._send(200, body)
+
+            body = render(symbol, year_month, until=api.now)
+            api.count("ok", len(body))
+            self._send(200, body)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            if url.path != "/clock" or "now" not in params:
+                return self._send(404, b'{"Error Message": "Not found."}')
+            api.now = datetime.strptime(params["now"], FORMAT_CODE)
+            self._send(200, json.dumps(api.stats()).encode())
+
+        def _send(self, status, body):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            # Written in pieces so clients really stream the body
+            for i in range(0, len(body), WRITE_CHUNK):
+                self.wfile.write(body[i:i + WRITE_CHUNK])
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the AlphaVantage intraday API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port.")
+    parser.add_argument("--now", help="Fake clock, 'YYYY-MM-DD HH:MM:SS' (default: now).")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before every answer.")
+    parser.add_argument("--note-rate", type=float, default=0.0, help="Share of months answered once with a rate-limit Note.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of months answered once with HTTP 500.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    api = FakeAlphaVantage(
+        now=datetime.strptime(args.now, FORMAT_CODE) if args.now else None,
+        latency=args.latency,
+        note_rate=args.note_rate,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    server = make_server(api, host=args.host, port=args.port)
+    # First line of output is read by utils/load_test.py to find the port
+    print(f"Listening on http://{args.host}:{server.server_port}/query", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    # Usage: python -m utils.fake_alphavantage [--port 8900] [--note-rate 0.05] ...
+    sys.exit(main())
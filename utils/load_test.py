@@ -0,0 +1,333 @@
+import os
+import re
+import sys
+import json
+import time
+import logging
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from urllib.request import Request, urlopen
+
+from utils.fake_alphavantage import FORMAT_CODE, month_bars
+from utils.profiling import reset_stages, stage_report
+from utils.settings import get_settings
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+LISTENING_LINE = re.compile(r"Listening on (http://\S+)")
+# The fake clock moves forward between the history and the incremental phase,
+# so the incremental run has new bars to pick up
+INCREMENTAL_ADVANCE = timedelta(hours=6)
+MAX_ROUNDS = 5
+
+
+class FakeServer:
+    """
+    Runs utils/fake_alphavantage.py in its own interpreter, so generating
+    responses does not compete with the pipeline for the GIL.
+    """
+
+    def __init__(self, now, latency=0.0, note_rate=0.0, error_rate=0.0, seed=0):
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "utils.fake_alphavantage",
+                "--now", now.strftime(FORMAT_CODE),
+                "--latency", str(latency),
+                "--note-rate", str(note_rate),
+                "--error-rate", str(error_rate),
+                "--seed", str(seed),
+            ],
+            cwd=project_root,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        match = LISTENING_LINE.search(self.process.stdout.readline())
+        if not match:
+            self.close()
+            raise RuntimeError("Fake AlphaVantage server did not start.")
+        self.query_url = match.group(1)
+        self.base_url = self.query_url.rsplit("/", 1)[0]
+
+    def set_clock(self, now):
+        url = f"{self.base_url}/clock?now={now.strftime(FORMAT_CODE).replace(' ', '%20')}"
+        with urlopen(Request(url, method="POST")) as r:
+            return json.load(r)
+
+    def stats(self):
+        with urlopen(f"{self.base_url}/stats") as r:
+            return json.load(r)
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait()
+        self.process.stdout.close()
+
+
+class CountingSink:
+    """Wraps a sink and counts the rows it actually inserted, across threads."""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.inserted = 0
+        self._lock = threading.Lock()
+
+    def write(self, symbol, rows):
+        inserted = self.sink.write(symbol, rows)
+        with self._lock:
+            self.inserted += inserted
+        return inserted
+
+    def __getattr__(self, name):
+        return getattr(self.sink, name)
+
+
+@contextmanager
+def _environment(**values):
+    """Points get_settings() at the given environment for the duration of the block."""
+    previous = {key: os.environ.get(key) for key in values}
+    os.environ.update(values)
+    get_settings.cache_clear()
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        get_settings.cache_clear()
+
+
+def _months(start_month, now):
+    year, month = map(int, start_month.split("-"))
+    while (year, month) <= (now.year, now.month):
+        yield f"{year}-{month:02d}"
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def expected_timestamps(symbol, start_month, now):
+    """Every bar the fake API has for symbol from start_month up to now."""
+    return [bar[0] for month in _months(start_month, now) for bar in month_bars(symbol, month, until=now)]
+
+
+def expected_watermark(symbol, now):
+    """
+    Where the CDC should end up: the newest bar of the current month, or the
+    end of the previous month (set by the scheduler) if there is none yet.
+    """
+    from ETL.scheduler import month_end
+
+    bars = month_bars(symbol, now.strftime("%Y-%m"), until=now)
+    if bars:
+        return bars[-1][0]
+    previous = now.replace(day=1) - timedelta(days=1)
+    return month_end(previous.strftime("%Y-%m")).strftime(FORMAT_CODE)
+
+
+def verify(sink, symbols, start_month, now, cdc_path):
+    """
+    Compares what was stored with what the fake API serves.
+
+    Returns:
+        (dict) symbol -> {"rows", "expected", "duplicates", "missing",
+        "unexpected", "watermark", "expected_watermark"}, (list) failure messages.
+    """
+    with open(cdc_path, "r") as f:
+        cdc = json.load(f)
+
+    results, failures = {}, []
+    for symbol in symbols:
+        stored = [
+            (ts.replace(tzinfo=None) if ts.tzinfo else ts).strftime(FORMAT_CODE)
+            for ts in sink.timestamps(symbol)
+        ]
+        expected = set(expected_timestamps(symbol, start_month, now))
+        stored_set = set(stored)
+        result = {
+            "rows": len(stored),
+            "expected": len(expected),
+            "duplicates": len(stored) - len(stored_set),
+            "missing": len(expected - stored_set),
+            "unexpected": len(stored_set - expected),
+            "watermark": cdc.get(f"{symbol}_cdc"),
+            "expected_watermark": expected_watermark(symbol, now),
+        }
+        results[symbol] = result
+        for key in ("duplicates", "missing", "unexpected"):
+            if result[key]:
+                failures.append(f"{symbol}: {result[key]} {key} row(s)")
+        if result["watermark"] != result["expected_watermark"]:
+            failures.append(
+                f"{symbol}: watermark {result['watermark']}, expected {result['expected_watermark']}"
+            )
+    return results, failures
+
+
+def run(
+    symbols,
+    years=3,
+    sink="sqlite",
+    concurrency=1,
+    latency=0.0,
+    note_rate=0.0,
+    error_rate=0.0,
+    seed=0,
+    workdir=None,
+):
+    """
+    End-to-end ingestion against a local fake AlphaVantage:
+
+    1. history: quota-aware catch-up (ETL/scheduler.py) from January of
+       (current year - years + 1), repeated until no call fails;
+    2. incremental: the fake clock moves forward and load_data runs for every
+       symbol until all CDC watermarks are current;
+    3. rerun: one more incremental pass, which must insert nothing;
+
+    then checks row counts, duplicates and watermarks against the generator.
+    With sink="postgres", DB_* must point at an empty throwaway database.
+
+    Returns:
+        A report dict (see format_report); report["ok"] is False if any check failed.
+    """
+    from ETL import scheduler
+    from ETL.cli import run_per_symbol
+    from ETL.Load_psql import load_data
+    from ETL.sinks import get_sink
+
+    now = datetime.now().replace(second=0, microsecond=0)
+    # Kept in the same month, so both phases agree on what the current month is
+    history_now = max(now - INCREMENTAL_ADVANCE, now.replace(day=1, hour=0, minute=0))
+    start_month = f"{now.year - years + 1}-01"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = workdir or tmp
+        os.makedirs(workdir, exist_ok=True)
+        cdc_path = os.path.join(workdir, "last_cdc.json")
+        state_path = os.path.join(workdir, "scheduler_state.json")
+        server = FakeServer(history_now, latency, note_rate, error_rate, seed)
+        # Per-month INFO logs would dominate the output (and the timings)
+        etl_logger = logging.getLogger("ETL")
+        level = etl_logger.level
+        etl_logger.setLevel(logging.WARNING)
+        try:
+            with _environment(
+                alphavantage_BASE_URL=server.query_url,
+                alphavantage_API_KEY="load-test",
+                CDC_PATH=cdc_path,
+                SQLITE_PATH=os.path.join(workdir, "stocks.db"),
+                CDC_LOG_PATH=os.path.join(workdir, "stocks_data_changes.jsonl"),
+                SCHEDULER_STATE_PATH=state_path,
+            ):
+                target = CountingSink(get_sink(sink))
+                target.ensure_schema()
+                reset_stages()
+                phases = []
+
+                # 1. History, month by month, advancing the watermarks
+                start = time.perf_counter()
+                # A rate-limit Note ends a catch-up run, like a used-up daily
+                # quota; keep starting new runs while they make progress
+                rounds = stalled = 0
+                failed = None
+                while failed != 0 and stalled < MAX_ROUNDS:
+                    positions = scheduler.catch_up_positions(
+                        symbols,
+                        scheduler.load_watermarks(symbols, cdc_path),
+                        scheduler.SchedulerState(state_path),
+                        start_month,
+                    )
+                    quota = sum(
+                        len(scheduler.months_to_fetch(positions[s], history_now, start_month))
+                        for s in symbols
+                    )
+                    succeeded, failed = scheduler.run(
+                        symbols, quota, sink=target, delay=0, start_month=start_month,
+                        state_path=state_path, now=history_now,
+                    )
+                    rounds += 1
+                    stalled = 0 if succeeded else stalled + 1
+                phases.append(("history", time.perf_counter() - start, target.inserted, rounds))
+
+                # 2. Incremental, after the clock has moved on
+                server.set_clock(now)
+                start = time.perf_counter()
+                before = target.inserted
+                rounds = 0
+                while rounds < MAX_ROUNDS:
+                    run_per_symbol(symbols, lambda s: load_data(s, sink=target), concurrency=concurrency)
+                    rounds += 1
+                    watermarks = scheduler.load_watermarks(symbols, cdc_path)
+                    if all(
+                        watermarks[s] is not None
+                        and watermarks[s].strftime(FORMAT_CODE) == expected_watermark(s, now)
+                        for s in symbols
+                    ):
+                        break
+                phases.append(("incremental", time.perf_counter() - start, target.inserted - before, rounds))
+
+                # 3. Same window again: everything is already stored
+                start = time.perf_counter()
+                before = target.inserted
+                run_per_symbol(symbols, lambda s: load_data(s, sink=target), concurrency=concurrency)
+                rerun_rows = target.inserted - before
+                phases.append(("rerun", time.perf_counter() - start, rerun_rows, 1))
+
+                stages = stage_report()
+                per_symbol, failures = verify(target, symbols, start_month, now, cdc_path)
+                if rerun_rows:
+                    failures.append(f"rerun inserted {rerun_rows} row(s); expected none")
+            server_stats = server.stats()
+        finally:
+            etl_logger.setLevel(level)
+            server.close()
+
+    return {
+        "ok": not failures,
+        "failures": failures,
+        "symbols": per_symbol,
+        "phases": phases,
+        "stages": stages,
+        "server": server_stats,
+        "start_month": start_month,
+        "now": now.strftime(FORMAT_CODE),
+    }
+
+
+def format_report(report):
+    from utils.profiling import format_stage_report
+
+    server = report["server"]
+    rows = sum(r["rows"] for r in report["symbols"].values())
+    lines = [
+        f"{len(report['symbols'])} symbol(s), {report['start_month']} to {report['now']}: {rows} rows stored",
+        f"fake API: {server['requests']} requests ({server['ok']} ok, {server['notes']} notes, "
+        f"{server['errors']} errors), {server['bytes'] / 1e6:.1f} MB served",
+        "",
+        f"{'phase':<12} {'seconds':>10} {'rows':>10} {'rows/s':>10} {'rounds':>7}",
+    ]
+    for name, seconds, inserted, rounds in report["phases"]:
+        rate = inserted / seconds if seconds else 0.0
+        lines.append(f"{name:<12} {seconds:>10.3f} {inserted:>10} {rate:>10.0f} {rounds:>7}")
+    lines += ["", format_stage_report(report["stages"]), ""]
+    if report["ok"]:
+        lines.append("OK: row counts, watermarks and uniqueness match the fake API.")
+    else:
+        lines.append("FAILED:")
+        lines += [f"  {failure}" for failure in report["failures"]]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # Usage: python -m utils.load_test [symbol ...]  (see also: python -m ETL load-test)
+    from ETL.cli import DEFAULT_SYMBOLS_FILE, read_symbols
+
+    logging.basicConfig(level=logging.INFO)
+    result = run(sys.argv[1:] or read_symbols(DEFAULT_SYMBOLS_FILE))
+    print(format_report(result))
+    sys.exit(0 if result["ok"] else 1)
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# --- Stage timers ---
+# Cheap enough to leave on permanently; --profile only decides whether they get reported.
+_lock = threading.Lock()
+_stage_seconds = defaultdict(float)
+_stage_calls = defaultdict(int)
+
+# Profilers of worker threads while profiled() is active; merged into its output
+_profiling = False
+_worker_profiles = []
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Adds the wall time of the wrapped block to the named stage
+    (e.g. 'fetch', 'parse', 'load', 'cdc').
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            _stage_seconds[name] += elapsed
+            _stage_calls[name] += 1
+
+
+def stage_report():
+    """
+    Returns [(stage, total_seconds, calls)] sorted by total time, largest first.
+    With --concurrency > 1 the totals are summed across threads.
+    """
+    with _lock:
+        return sorted(
+            ((name, _stage_seconds[name], _stage_calls[name]) for name in _stage_seconds),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+
+def reset_stages():
+    with _lock:
+        _stage_seconds.clear()
+        _stage_calls.clear()
+
+
+def format_stage_report(report, wall_seconds=None):
+    lines = [f"{'stage':<12} {'seconds':>10} {'calls':>7}"]
+    for name, seconds, calls in report:
+        lines.append(f"{name:<12} {seconds:>10.3f} {calls:>7}")
+    if wall_seconds is not None:
+        lines.append(f"{'total wall':<12} {wall_seconds:>10.3f}")
+    return "\n".join(lines)
+
+
+@contextmanager
+def worker_profile():
+    """
+    Profiles the wrapped block in the calling worker thread while profiled()
+    is active, so work done off the main thread ends up in its .pstats too.
+    """
+    if not _profiling:
+        yield
+        return
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ profiles all threads from the main profiler already
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        with _lock:
+            _worker_profiles.append(profiler)
+
+
+@contextmanager
+def profiled(output_dir: str, label: str):
+    """
+    Runs the wrapped block under cProfile and writes <label>_<timestamp>.pstats
+    and a matching .txt summary (top functions + per-stage wall time) to output_dir.
+    Blocks run in worker threads under worker_profile() are merged in.
+    """
+    global _profiling
+    import cProfile
+    import io
+    import pstats
+
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, f"{label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+
+    reset_stages()
+    with _lock:
+        _worker_profiles.clear()
+    _profiling = True
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _profiling = False
+        wall_seconds = time.perf_counter() - start
+
+        summary = io.StringIO()
+        stats = pstats.Stats(profiler, stream=summary)
+        with _lock:
+            for worker in _worker_profiles:
+                stats.add(worker)
+            _worker_profiles.clear()
+        stats.dump_stats(f"{base}.pstats")
+        stats.sort_stats("cumulative").print_stats(30)
+        stages = format_stage_report(stage_report(), wall_seconds)
+        with open(f"{base}.txt", "w", encoding="utf-8") as f:
+            f.write(stages + "\n\n" + summary.getvalue())
+
+        logger.info(f"Per-stage wall time:\n{stages}")
+        logger.info(f"Profile written to {base}.pstats (summary in {base}.txt)")
@@ -1,36 +1,13 @@
 import smtplib
-from dotenv import load_dotenv
-import os
 from email.message import EmailMessage
 from datetime import datetime
 import ssl
 import logging
 
+from utils.settings import get_settings
+
 # Configure logger
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
-
-# --- Load .env file ---
-project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-dotenv_path = os.path.join(project_root, "Config", ".env")
-
-logger.info(f"Attempting to load .env")
-
-if os.path.exists(dotenv_path):
-    load_dotenv(dotenv_path=dotenv_path)
-    logger.info(".env file found and loaded successfully.")
-else:
-    load_dotenv()  # fallback to default search
-    logger.warning(f".env not found at {dotenv_path}. Loaded from default location.")
-
-# --- Configuration ---
-SENDER_EMAIL = os.getenv("sender_email")
-RECEIVER_EMAIL = os.getenv("receiver_email")
-PASSWORD = os.getenv("email_app_passwd")
-
-# FIX: Missing SMTP server & port
-SMTP_SERVER = os.getenv("smtp_server", "smtp.gmail.com")
-SMTP_PORT = int(os.getenv("smtp_port", 587))
 
 
 def send_mail(body: str):
@@ -38,9 +15,10 @@ def send_mail(body: str):
     Sends an email using SMTP with TLS encryption.
     Raises an exception if configuration or sending fails.
     """
+    settings = get_settings()
 
     # Validate all config variables
-    if not all([SENDER_EMAIL, RECEIVER_EMAIL, PASSWORD]):
+    if not all([settings.sender_email, settings.receiver_email, settings.email_password]):
         logger.error("Missing email configuration variables.")
         raise ValueError(
             "Missing required .env variables: sender_email, receiver_email, email_app_passwd"
@@ -50,8 +28,8 @@ def send_mail(body: str):
 
     msg = EmailMessage()
     msg["Subject"] = "Python Automated ETL Pipeline"
-    msg["From"] = SENDER_EMAIL
-    msg["To"] = RECEIVER_EMAIL
+    msg["From"] = settings.sender_email
+    msg["To"] = settings.receiver_email
 
     msg.set_content(
         f"ETL Pipeline executed on: {current_datetime}\n\n"
@@ -61,9 +39,9 @@ def send_mail(body: str):
     context = ssl.create_default_context()
 
     try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+        with smtplib.SMTP(settings.smtp_server, settings.smtp_port) as server:
             server.starttls(context=context)
-            server.login(SENDER_EMAIL, PASSWORD)
+            server.login(settings.sender_email, settings.email_password)
             server.send_message(msg)
 
         logger.info("Email successfully sent!")
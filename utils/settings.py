@@ -0,0 +1,90 @@
+import os
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# --- Paths ---
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+dotenv_path = os.path.join(project_root, "Config", ".env")
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    All runtime configuration in one place, read from the environment / .env.
+    Use get_settings() instead of constructing this directly.
+    """
+
+    api_key: str | None
+    api_base_url: str
+    db_name: str | None
+    db_user: str | None
+    db_pass: str | None
+    db_host: str | None
+    db_port: str | None
+    sender_email: str | None
+    receiver_email: str | None
+    email_password: str | None
+    smtp_server: str
+    smtp_port: int
+    cdc_path: str
+    cdc_feed_sinks: tuple
+    cdc_log_path: str
+    sqlite_path: str
+    scheduler_state_path: str
+
+    @property
+    def db_config(self):
+        """Keyword arguments for psycopg2.connect."""
+        return {
+            "dbname": self.db_name,
+            "user": self.db_user,
+            "password": self.db_pass,
+            "host": self.db_host,
+            "port": self.db_port,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_settings():
+    """
+    Loads the .env file on first call and returns the cached Settings.
+    Nothing is read at import time, so entry points only pay for this when
+    they actually need configuration.
+    """
+    from dotenv import load_dotenv
+
+    if os.path.exists(dotenv_path):
+        load_dotenv(dotenv_path=dotenv_path)
+        logger.debug(f"Loaded .env from {dotenv_path}.")
+    else:
+        load_dotenv()  # fallback to default search
+        logger.debug(f".env not found at {dotenv_path}. Loaded from default location.")
+
+    return Settings(
+        api_key=os.getenv("alphavantage_API_KEY"),
+        # Overridden by the load test harness to point at its local fake server
+        api_base_url=os.getenv("alphavantage_BASE_URL") or "https://www.alphavantage.co/query",
+        db_name=os.getenv("DB_NAME"),
+        db_user=os.getenv("DB_USER"),
+        db_pass=os.getenv("DB_PASS"),
+        db_host=os.getenv("DB_HOST"),
+        db_port=os.getenv("DB_PORT"),
+        sender_email=os.getenv("sender_email"),
+        receiver_email=os.getenv("receiver_email"),
+        email_password=os.getenv("email_app_passwd"),
+        smtp_server=os.getenv("smtp_server", "smtp.gmail.com"),
+        smtp_port=int(os.getenv("smtp_port", 587)),
+        cdc_path=os.getenv("CDC_PATH", "cdc_/last_cdc.json"),
+        # Optional change streams on top of the outbox table: "notify", "file" (comma separated)
+        cdc_feed_sinks=tuple(
+            s.strip() for s in os.getenv("CDC_FEED_SINKS", "").split(",") if s.strip()
+        ),
+        # Where the "file" change stream is appended
+        cdc_log_path=os.getenv("CDC_LOG_PATH", "cdc_/stocks_data_changes.jsonl"),
+        sqlite_path=os.getenv("SQLITE_PATH", "cdc_/stocks.db"),
+        scheduler_state_path=os.getenv("SCHEDULER_STATE_PATH", "cdc_/scheduler_state.json"),
+    )